@@ -39,6 +39,8 @@ const config = {
     timeout: process.env.CRAWLER_TIMEOUT || 300000,
     retryAttempts: process.env.CRAWLER_RETRY_ATTEMPTS || 3,
     maxConcurrentTasks: process.env.MAX_CONCURRENT_TASKS || 5,
+    // 'process': 每个任务启动一个 crawl.py 子进程; 'worker': 派发给常驻 Python 工作进程
+    executionMode: process.env.CRAWLER_EXECUTION_MODE || 'process',
   },
 
   logging: {
@@ -1,8 +1,13 @@
+const { once } = require('events');
 const Post = require('../models/Post');
+const PostChunk = require('../models/PostChunk');
 const AppError = require('../utils/AppError');
 const catchAsync = require('../utils/catchAsync');
+const { unpackText } = require('../utils/textCodec');
 
 // Get all posts
+// List endpoints return the stored preview in content (plus contentChars for compressed
+// content); the full text comes from getPostById or getPostText
 exports.getAllPosts = catchAsync(async (req, res) => {
   const { taskId, postType, status, page = 1, limit = 20, sort = '-createdAt' } = req.query;
 
@@ -36,11 +41,17 @@ exports.getAllPosts = catchAsync(async (req, res) => {
 // Get single post by ID
 exports.getPostById = catchAsync(async (req, res) => {
   const post = await Post.findById(req.params.id)
+    .select('+contentZstd')
     .populate('taskId', 'name');
 
   if (!post) {
     throw new AppError('Post not found', 404);
   }
+  // Replace compressed content with the full text before responding
+  if (post.contentZstd) {
+    post.content = await unpackText(post, 'content');
+    post.contentZstd = undefined;
+  }
 
   res.status(200).json({
     success: true,
@@ -48,6 +59,76 @@ exports.getPostById = catchAsync(async (req, res) => {
   });
 });
 
+// Get a page of content chunks of a post stored in chunks
+exports.getPostChunks = catchAsync(async (req, res) => {
+  const page = Math.max(parseInt(req.query.page) || 1, 1);
+  const limit = Math.min(Math.max(parseInt(req.query.limit) || 1, 1), 20);
+
+  const post = await Post.findById(req.params.id).select('contentChunks');
+  if (!post) {
+    throw new AppError('Post not found', 404);
+  }
+  const index = post.contentChunks;
+  if (!index || !index.generation) {
+    throw new AppError('Post content is not stored in chunks', 400);
+  }
+
+  const chunks = await PostChunk.find({ generation: index.generation })
+    .sort('seq')
+    .skip((page - 1) * limit)
+    .limit(limit)
+    .select('seq firstPage lastPage floors chars text textZstd textDictId')
+    .lean();
+  const data = await Promise.all(chunks.map(async ({ textZstd, textDictId, ...chunk }) => ({
+    ...chunk,
+    text: await unpackText({ text: chunk.text, textZstd, textDictId }, 'text'),
+  })));
+
+  res.status(200).json({
+    success: true,
+    data,
+    pagination: {
+      total: index.count,
+      page,
+      limit,
+      pages: Math.ceil(index.count / limit),
+    },
+  });
+});
+
+// Stream the full text content of a post, reading chunks one at a time
+exports.getPostText = catchAsync(async (req, res) => {
+  const post = await Post.findById(req.params.id)
+    .select('content contentZstd contentDictId contentChunks');
+  if (!post) {
+    throw new AppError('Post not found', 404);
+  }
+
+  const index = post.contentChunks;
+  if (!index || !index.generation) {
+    const content = await unpackText(post, 'content');
+    res.setHeader('Content-Type', 'text/plain; charset=utf-8');
+    res.send(content || '');
+    return;
+  }
+
+  res.setHeader('Content-Type', 'text/plain; charset=utf-8');
+  const cursor = PostChunk.find({ generation: index.generation })
+    .sort('seq')
+    .select('text textZstd textDictId')
+    .lean()
+    .cursor();
+  let first = true;
+  for await (const chunk of cursor) {
+    const text = await unpackText(chunk, 'text');
+    if (!res.write(first ? text : `\n\n${text}`)) {
+      await once(res, 'drain');
+    }
+    first = false;
+  }
+  res.end();
+});
+
 // Get posts by task ID
 exports.getPostsByTaskId = catchAsync(async (req, res) => {
   const { page = 1, limit = 20, sort = '-createdAt', postType } = req.query;
@@ -111,6 +192,9 @@ exports.deletePost = catchAsync(async (req, res) => {
   if (!post) {
     throw new AppError('Post not found', 404);
   }
+  if (post.sourceUrl) {
+    await PostChunk.deleteMany({ sourceUrl: post.sourceUrl });
+  }
 
   res.status(200).json({
     success: true,
@@ -8,7 +8,7 @@ const routes = require('./routes');
 const config = require('./config/config');
 const { connectDB } = require('./config/database');
 const { crawlerQueue } = require('./services/crawlerQueue');
-const { executeCrawler } = require('./services/crawlerExecutor');
+const { executeCrawler, executeCrawlerViaWorker } = require('./services/crawlerExecutor');
 const Task = require('./models/Task');
 
 const app = express();
@@ -55,7 +55,11 @@ const startServer = async () => {
 
     // 设置爬虫队列处理
     console.log('⊙ 初始化爬虫队列...');
-    crawlerQueue.process(1, async (job) => {
+    // 工作进程模式下可并发派发多个任务
+    const useWorker = config.crawler.executionMode === 'worker';
+    const queueConcurrency = useWorker ? Number(config.crawler.maxConcurrentTasks) : 1;
+    const runCrawler = useWorker ? executeCrawlerViaWorker : executeCrawler;
+    crawlerQueue.process(queueConcurrency, async (job) => {
       const { taskId, forumUrl, taskType, config: taskConfig } = job.data;
 
       try {
@@ -68,7 +72,7 @@ const startServer = async () => {
         });
 
         // 执行爬虫
-        const result = await executeCrawler(taskId, forumUrl, taskType, taskConfig);
+        const result = await runCrawler(taskId, forumUrl, taskType, taskConfig);
 
         // 获取任务信息，检查是否需要从标题更新名称
         const task = await Task.findById(taskId);
@@ -1,4 +1,9 @@
 const errorHandler = (err, req, res, next) => {
+  // Streaming responses (post text) can fail after headers are sent
+  if (res.headersSent) {
+    return next(err);
+  }
+
   err.statusCode = err.statusCode || 500;
   err.message = err.message || 'Internal Server Error';
 
@@ -13,6 +13,19 @@ const postSchema = new mongoose.Schema(
       trim: true,
     },
     content: String,
+    // zstd-compressed content (see utils/textCodec); content then holds a preview
+    contentZstd: {
+      type: Buffer,
+      select: false,
+    },
+    contentDictId: Number,
+    contentChars: Number,
+    // Set when the content is stored in post_chunks; content then holds a preview
+    contentChunks: {
+      generation: mongoose.Schema.Types.ObjectId,
+      count: Number,
+      chars: Number,
+    },
     postType: {
       type: String,
       enum: ['novel', 'image', 'text'],
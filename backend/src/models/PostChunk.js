@@ -0,0 +1,31 @@
+const mongoose = require('mongoose');
+
+// Content chunks of long novel posts, written by the crawler while it extracts
+// pages. A post's contentChunks.generation selects the chunks to read, in seq order.
+const postChunkSchema = new mongoose.Schema({
+  sourceUrl: {
+    type: String,
+    required: true,
+  },
+  generation: {
+    type: mongoose.Schema.Types.ObjectId,
+    required: true,
+  },
+  seq: {
+    type: Number,
+    required: true,
+  },
+  firstPage: Number,
+  lastPage: Number,
+  floors: Number,
+  chars: Number,
+  text: String,
+  textZstd: Buffer,
+  textDictId: Number,
+  textChars: Number,
+});
+
+postChunkSchema.index({ generation: 1, seq: 1 }, { unique: true });
+postChunkSchema.index({ sourceUrl: 1 });
+
+module.exports = mongoose.model('PostChunk', postChunkSchema, 'post_chunks');
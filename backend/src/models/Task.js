@@ -59,6 +59,16 @@ const taskSchema = new mongoose.Schema(
       },
       userAgent: String,
       headers: mongoose.Schema.Types.Mixed,
+      // 增量爬取：只获取帖子上次爬取之后的新页面
+      incremental: {
+        type: Boolean,
+        default: false,
+      },
+      // 性能分析：爬虫写入 cProfile / tracemalloc 快照
+      profile: {
+        type: Boolean,
+        default: false,
+      },
     },
     errorLog: [
       {
@@ -7,6 +7,8 @@ const router = express.Router();
 router.get('/', postController.getAllPosts);
 router.post('/', postController.createPost);
 router.get('/:id', postController.getPostById);
+router.get('/:id/chunks', postController.getPostChunks);
+router.get('/:id/text', postController.getPostText);
 router.put('/:id', postController.updatePost);
 router.delete('/:id', postController.deletePost);
 
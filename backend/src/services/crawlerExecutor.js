@@ -1,5 +1,6 @@
 const { spawn } = require('child_process');
 const path = require('path');
+const { createClient } = require('redis');
 const Task = require('../models/Task');
 const config = require('../config/config');
 
@@ -29,6 +30,14 @@ async function executeCrawler(taskId, forumUrl, taskType, taskConfig) {
         '--delay', taskConfig?.delay || 1000,
         '--timeout', timeout,
       ];
+      // 增量爬取：只获取帖子上次爬取之后的新页面
+      if (taskConfig?.incremental) {
+        args.push('--incremental');
+      }
+      // 性能分析：写入 cProfile / tracemalloc 快照
+      if (taskConfig?.profile) {
+        args.push('--profile', process.env.CRAWLER_PROFILE_DIR || 'profiles');
+      }
 
       console.log(`[爬虫] 启动爬虫: ${pythonPath} crawl.py --task-id ${taskId}`);
 
@@ -65,33 +74,7 @@ async function executeCrawler(taskId, forumUrl, taskType, taskConfig) {
         try {
           const lines = data.toString().trim().split('\n');
           for (const line of lines) {
-            // 标准格式: PROGRESS:XX
-            if (line.includes('PROGRESS:')) {
-              const progress = parseInt(line.split('PROGRESS:')[1]);
-              updateTaskProgress(taskId, progress);
-            } 
-            // 替代格式: [图片下载] 进度: X/Y
-            else if (line.includes('[图片下载] 进度:')) {
-              const match = line.match(/进度:\s*(\d+)\/(\d+)/);
-              if (match) {
-                const current = parseInt(match[1]);
-                const total = parseInt(match[2]);
-                const progress = total > 0 ? Math.round((current / total) * 100) : 0;
-                updateTaskProgress(taskId, progress);
-              }
-            } 
-            // 爬取数量: CRAWLED:XX
-            else if (line.includes('CRAWLED:')) {
-              const count = parseInt(line.split('CRAWLED:')[1]);
-              updateTaskCrawledCount(taskId, count);
-            }
-            // 页面标题: TITLE:XXX
-            else if (line.includes('TITLE:')) {
-              const title = line.split('TITLE:')[1]?.trim();
-              if (title) {
-                crawlerOutput.title = title;
-              }
-            }
+            handleCrawlerLine(taskId, line, crawlerOutput);
           }
         } catch (e) {
           // 忽略解析错误
@@ -135,6 +118,121 @@ async function executeCrawler(taskId, forumUrl, taskType, taskConfig) {
   });
 }
 
+/**
+ * 解析爬虫输出的一行协议数据（NDJSON 事件，或旧格式 PROGRESS / CRAWLED / TITLE）
+ * @param {string} taskId - 任务 ID
+ * @param {string} line - 输出行
+ * @param {object} crawlerOutput - 用于存储解析出的信息（如标题）
+ */
+function handleCrawlerLine(taskId, line, crawlerOutput) {
+  // NDJSON 事件: {"event":"progress"|"title"|"crawled", ...}
+  // 爬虫端已按时间间隔合并进度，每个事件对应一次数据库写入
+  if (line.startsWith('{"event":')) {
+    const event = JSON.parse(line);
+    if (event.event === 'progress') {
+      updateTaskProgress(taskId, event.percent);
+    } else if (event.event === 'crawled') {
+      updateTaskCrawledCount(taskId, event.count);
+    } else if (event.event === 'title' && event.title) {
+      crawlerOutput.title = event.title;
+    }
+  }
+  // 标准格式: PROGRESS:XX
+  else if (line.includes('PROGRESS:')) {
+    const progress = parseInt(line.split('PROGRESS:')[1]);
+    updateTaskProgress(taskId, progress);
+  }
+  // 替代格式: [图片下载] 进度: X/Y
+  else if (line.includes('[图片下载] 进度:')) {
+    const match = line.match(/进度:\s*(\d+)\/(\d+)/);
+    if (match) {
+      const current = parseInt(match[1]);
+      const total = parseInt(match[2]);
+      const progress = total > 0 ? Math.round((current / total) * 100) : 0;
+      updateTaskProgress(taskId, progress);
+    }
+  }
+  // 爬取数量: CRAWLED:XX
+  else if (line.includes('CRAWLED:')) {
+    const count = parseInt(line.split('CRAWLED:')[1]);
+    updateTaskCrawledCount(taskId, count);
+  }
+  // 页面标题: TITLE:XXX
+  else if (line.includes('TITLE:')) {
+    const title = line.split('TITLE:')[1]?.trim();
+    if (title) {
+      crawlerOutput.title = title;
+    }
+  }
+}
+
+/**
+ * 将任务派发给常驻 Python 爬虫工作进程 (python -m app.worker) 执行
+ * 任务写入 Redis 列表 crawler:jobs，进度和结果通过频道 crawler:events:<taskId> 返回
+ * 超时时从队列中移除尚未取出的任务，并通过频道 crawler:cancel:<taskId> 通知工作进程停止正在执行的任务
+ * @param {string} taskId - 任务 ID
+ * @param {string} forumUrl - 论坛 URL
+ * @param {string} taskType - 任务类型 (novel, image, mixed)
+ * @param {object} taskConfig - 爬虫配置
+ * @returns {Promise} 爬虫执行结果
+ */
+async function executeCrawlerViaWorker(taskId, forumUrl, taskType, taskConfig) {
+  const redisOptions = {
+    socket: { host: config.redis.host, port: Number(config.redis.port) },
+    password: config.redis.password || undefined,
+  };
+  const publisher = createClient(redisOptions);
+  const subscriber = publisher.duplicate();
+  await Promise.all([publisher.connect(), subscriber.connect()]);
+
+  const timeout = taskConfig?.timeout || 600000;
+  const channel = `crawler:events:${taskId}`;
+  const job = JSON.stringify({ taskId, forumUrl, taskType, config: taskConfig || {} });
+  const crawlerOutput = {};
+  let timer;
+
+  try {
+    return await new Promise((resolve, reject) => {
+      timer = setTimeout(() => {
+        // 工作进程在下一个页面或图片下载之前停止，检查点保留给重试
+        Promise.all([
+          publisher.lRem('crawler:jobs', 0, job),
+          publisher.publish(`crawler:cancel:${taskId}`, 'timeout'),
+        ])
+          .catch((error) => console.error(`[爬虫] 取消任务失败: ${error.message}`))
+          .finally(() => reject(new Error(`爬虫执行超时 (${timeout}ms)`)));
+      }, timeout);
+
+      // 先订阅再派发任务，避免丢失事件
+      subscriber
+        .subscribe(channel, (message) => {
+          console.log(`[爬虫输出] ${message}`);
+          if (message.startsWith('RESULT:')) {
+            const result = JSON.parse(message.slice('RESULT:'.length));
+            if (result.success) {
+              resolve({ ...result, taskId, ...crawlerOutput });
+            } else {
+              reject(new Error(`爬虫任务失败: ${result.error}`));
+            }
+          } else {
+            try {
+              handleCrawlerLine(taskId, message, crawlerOutput);
+            } catch (e) {
+              // 忽略解析错误
+            }
+          }
+        })
+        .then(() => publisher.lPush('crawler:jobs', job))
+        .then(() => console.log(`[爬虫] 任务已派发给工作进程: ${taskId}`))
+        .catch(reject);
+    });
+  } finally {
+    clearTimeout(timer);
+    await subscriber.quit().catch(() => {});
+    await publisher.quit().catch(() => {});
+  }
+}
+
 /**
  * 更新任务进度
  */
@@ -167,6 +265,7 @@ async function updateTaskCrawledCount(taskId, count) {
 
 module.exports = {
   executeCrawler,
+  executeCrawlerViaWorker,
   updateTaskProgress,
   updateTaskCrawledCount,
 };
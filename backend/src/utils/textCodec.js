@@ -0,0 +1,51 @@
+const mongoose = require('mongoose');
+const AppError = require('./AppError');
+
+// zstd-napi is only needed once the crawler stores compressed content
+let zstd = null;
+try {
+  // eslint-disable-next-line global-require
+  zstd = require('zstd-napi');
+} catch (error) {
+  zstd = null;
+}
+
+const DICT_COLLECTION = 'zstd_dictionaries';
+const decompressors = new Map();
+
+// Decompressor for a dictionary id (0 = no dictionary), loaded once per process
+const getDecompressor = async (dictId) => {
+  if (!decompressors.has(dictId)) {
+    const decompressor = new zstd.Decompressor();
+    if (dictId) {
+      const dictionary = await mongoose.connection.db
+        .collection(DICT_COLLECTION)
+        .findOne({ _id: dictId });
+      if (!dictionary) {
+        throw new AppError(`zstd dictionary ${dictId} not found`, 500);
+      }
+      decompressor.loadDictionary(Buffer.from(dictionary.data.buffer));
+    }
+    decompressors.set(dictId, decompressor);
+  }
+  return decompressors.get(dictId);
+};
+
+/**
+ * Read a text field stored by the crawler's TextCodec.pack: compressed text
+ * lives in <field>Zstd / <field>DictId, otherwise the field holds the text.
+ */
+const unpackText = async (doc, field) => {
+  const data = doc[`${field}Zstd`];
+  if (!data) {
+    return doc[field];
+  }
+  if (!zstd) {
+    throw new AppError('Reading compressed content requires zstd-napi', 500);
+  }
+  const buffer = Buffer.isBuffer(data) ? data : Buffer.from(data.buffer);
+  const decompressor = await getDecompressor(doc[`${field}DictId`] || 0);
+  return decompressor.decompress(buffer).toString('utf8');
+};
+
+module.exports = { unpackText };
@@ -1,7 +1,24 @@
-import requests
 from bs4 import BeautifulSoup
-from .config import CRAWLER_TIMEOUT, USER_AGENT
+from .config import (
+    CRAWLER_TIMEOUT,
+    USER_AGENT,
+    HTTP_CACHE_DIR,
+    HTTP_CACHE_MAX_SIZE,
+    DOWNLOAD_DELAY,
+    RATE_LIMIT_MIN,
+    RATE_LIMIT_MAX,
+    RETRY_BUDGET,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+)
+from . import metrics
+from .http_client import HttpClient
 from .logger import logger
+from .middlewares.http_cache import HttpCache
+from .middlewares.rate_limiter import HostRateLimiter
+from .middlewares.retry import CircuitBreaker, RetryBudget, RetryPolicy
 
 class BaseCrawler:
     """Base crawler class for forum scraping"""
@@ -12,29 +29,51 @@ class BaseCrawler:
         self.session = self._init_session()
         self.timeout = self.config.get('timeout', CRAWLER_TIMEOUT)
         self.retry_attempts = self.config.get('retry_attempts', 3)
+        self.http_cache = self._init_http_cache()
+        self.rate_limiter = HostRateLimiter.from_delay(
+            self.config.get('delay', DOWNLOAD_DELAY * 1000),
+            min_rate=RATE_LIMIT_MIN,
+            max_rate=RATE_LIMIT_MAX,
+        )
+        self.retry_policy = RetryPolicy(
+            attempts=self.retry_attempts,
+            base_delay=RETRY_BASE_DELAY,
+            max_delay=RETRY_MAX_DELAY,
+            budget=RetryBudget(RETRY_BUDGET),
+            breaker=CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT),
+        )
     
     def _init_session(self):
-        """Initialize requests session with headers"""
-        session = requests.Session()
-        session.headers.update({
+        """Initialize a pooled HTTP client with the configured headers"""
+        return HttpClient(headers={
             'User-Agent': self.config.get('user_agent', USER_AGENT),
             **self.config.get('headers', {})
         })
-        return session
+    
+    def _init_http_cache(self):
+        """Initialize optional on-disk HTTP cache"""
+        cache_dir = self.config.get('http_cache_dir', HTTP_CACHE_DIR)
+        if not cache_dir:
+            return None
+        return HttpCache(cache_dir, self.config.get('http_cache_max_size', HTTP_CACHE_MAX_SIZE))
     
     def fetch_page(self, url):
-        """Fetch page content with retry logic"""
-        for attempt in range(self.retry_attempts):
-            try:
-                logger.info(f'Fetching: {url} (Attempt {attempt + 1})')
-                response = self.session.get(url, timeout=self.timeout / 1000)
-                response.raise_for_status()
-                return response.text
-            except Exception as e:
-                logger.warning(f'Fetch failed: {str(e)}')
-                if attempt == self.retry_attempts - 1:
-                    raise
-        return None
+        """Fetch page content, retrying transient failures with backoff"""
+        logger.info(f'Fetching: {url}')
+        if self.http_cache:
+            send = lambda: self.http_cache.get(self.session, url, timeout=self.timeout / 1000)
+        else:
+            send = lambda: self.session.get(url, timeout=self.timeout / 1000)
+        tracked = lambda: metrics.track_request('page', url, send)
+        try:
+            response = self.retry_policy.call(url, lambda: self.rate_limiter.request(url, tracked))
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning(f'Fetch failed: {str(e)}')
+            raise
+        if not getattr(response, 'from_cache', False):
+            metrics.RESPONSE_BYTES.labels('page').inc(len(response.content))
+        return response.text
     
     def parse_html(self, html):
         """Parse HTML content"""
@@ -51,3 +90,5 @@ class BaseCrawler:
     def close(self):
         """Close session"""
         self.session.close()
+        if self.http_cache:
+            self.http_cache.close()
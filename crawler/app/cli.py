@@ -11,7 +11,7 @@ import json
 from pathlib import Path
 
 from app.engine import CrawlerEngine
-from app.config import LOGGER, MONGODB_URI, REDIS_HOST, REDIS_PORT
+from app.config import MONGODB_URI, REDIS_HOST, REDIS_PORT
 from app.logger import logger
 
 def parse_arguments():
@@ -29,6 +29,7 @@ def parse_arguments():
 
 def main():
     """主入口函数"""
+    engine = None
     try:
         args = parse_arguments()
         
@@ -67,6 +68,10 @@ def main():
         logger.error(f'Fatal error: {str(e)}')
         print(f'ERROR:{str(e)}', file=sys.stderr)
         sys.exit(1)
+    finally:
+        # 写入缓冲的数据并等待图片缩略图生成完成
+        if engine:
+            engine.close()
 
 if __name__ == '__main__':
     main()
@@ -6,6 +6,13 @@ load_dotenv()
 # Database
 MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/forum-crawler')
 
+# Bulk writes (write concern: 0, 1, 'majority', ...)
+MONGO_BULK_BATCH_SIZE = int(os.getenv('MONGO_BULK_BATCH_SIZE', 100))
+MONGO_BULK_FLUSH_INTERVAL = float(os.getenv('MONGO_BULK_FLUSH_INTERVAL', 2.0))  # in seconds
+_write_concern = os.getenv('MONGO_WRITE_CONCERN', '1')
+MONGO_WRITE_CONCERN = int(_write_concern) if _write_concern.isdigit() else _write_concern
+MONGO_WRITE_JOURNAL = os.getenv('MONGO_WRITE_JOURNAL', '').lower() in ('1', 'true', 'yes') or None
+
 # Redis
 REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
 REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
@@ -15,14 +22,82 @@ REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', '')
 CRAWLER_TIMEOUT = int(os.getenv('CRAWLER_TIMEOUT', 30000))
 CRAWLER_RETRY_ATTEMPTS = int(os.getenv('CRAWLER_RETRY_ATTEMPTS', 3))
 MAX_CONCURRENT_TASKS = int(os.getenv('MAX_CONCURRENT_TASKS', 5))
+PAGE_CONCURRENCY = int(os.getenv('CRAWLER_PAGE_CONCURRENCY', 4))
+PER_HOST_LIMIT = int(os.getenv('CRAWLER_PER_HOST_LIMIT', 4))
+BOARD_CONCURRENCY = int(os.getenv('CRAWLER_BOARD_CONCURRENCY', 2))
+# Processes parsing the later pages of long threads (0 = parse in the fetch threads)
+PARSE_WORKERS = int(os.getenv('CRAWLER_PARSE_WORKERS', min(8, (os.cpu_count() or 1) // 2)))
+
+# Retries (per request attempts, per task retry budget) and per-host circuit breaker
+RETRY_BUDGET = int(os.getenv('CRAWLER_RETRY_BUDGET', 100))
+RETRY_BASE_DELAY = float(os.getenv('CRAWLER_RETRY_BASE_DELAY', 0.5))
+RETRY_MAX_DELAY = float(os.getenv('CRAWLER_RETRY_MAX_DELAY', 10))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', 30))
 
 # Download Settings
-DOWNLOAD_DELAY = 1  # in seconds
-USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+DOWNLOAD_DELAY = float(os.getenv('DOWNLOAD_DELAY', 1))  # initial per-host interval, in seconds
+RATE_LIMIT_MIN = float(os.getenv('CRAWLER_MIN_RATE', 0.2))  # requests per second per host
+RATE_LIMIT_MAX = float(os.getenv('CRAWLER_MAX_RATE', 20))
+
+# Shared HTTP client (app.http_client): idle keep-alive connections kept per host
+# and number of hosts with a pool, default timeouts (s), DNS cache TTL (s, 0 = disabled)
+USER_AGENT = os.getenv(
+    'CRAWLER_USER_AGENT',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+)
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 32))
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 64))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 10))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 10))
+HTTP_DNS_CACHE_TTL = float(os.getenv('HTTP_DNS_CACHE_TTL', 300))
+HTTP_VERIFY_TLS = os.getenv('HTTP_VERIFY_TLS', 'true').lower() not in ('0', 'false', 'no')
+
+# HTTP Cache (empty dir disables the cache)
+HTTP_CACHE_DIR = os.getenv('HTTP_CACHE_DIR', '')
+HTTP_CACHE_MAX_SIZE = int(os.getenv('HTTP_CACHE_MAX_SIZE', 512 * 1024 * 1024))
+
+# Profiling: tasks started with config.profile write cProfile/tracemalloc snapshots here
+PROFILE_DIR = os.getenv('CRAWLER_PROFILE_DIR', 'profiles')
+
+# Metrics: Prometheus text on http://<host>:<port>/metrics (0 = disabled) and/or
+# a textfile for node_exporter's textfile collector (empty = disabled)
+METRICS_PORT = int(os.getenv('CRAWLER_METRICS_PORT', 0))
+METRICS_TEXTFILE = os.getenv('CRAWLER_METRICS_TEXTFILE', '')
+METRICS_TEXTFILE_INTERVAL = float(os.getenv('CRAWLER_METRICS_TEXTFILE_INTERVAL', 15))
+
+# Seen-URL Index (empty dir disables the index)
+SEEN_INDEX_DIR = os.getenv('SEEN_INDEX_DIR', '')
+SEEN_INDEX_CAPACITY = int(os.getenv('SEEN_INDEX_CAPACITY', 1000000))
+
+# Task checkpoints: completed pages, downloads and board threads are journaled
+# so a retried task resumes where the failed attempt stopped.
+# '' (disabled), 'file' (SQLite in CHECKPOINT_DIR) or 'mongo' (crawl_checkpoints collection)
+CHECKPOINT = os.getenv('CRAWLER_CHECKPOINT', '')
+CHECKPOINT_DIR = os.getenv('CHECKPOINT_DIR', 'checkpoints')
+CHECKPOINT_MAX_AGE = float(os.getenv('CHECKPOINT_MAX_AGE_HOURS', 168)) * 3600
+
+# Novel content above this many characters is streamed to the post_chunks
+# collection while it is extracted (0 = always store inline in posts.content)
+NOVEL_CHUNK_CHARS = int(os.getenv('NOVEL_CHUNK_CHARS', 65536))
+
+# Content compression: 'zstd' stores post content and chunks zstd-compressed,
+# using the newest dictionary trained with `python text_codec.py train`
+CONTENT_COMPRESSION = os.getenv('CONTENT_COMPRESSION', '')
+CONTENT_COMPRESSION_LEVEL = int(os.getenv('CONTENT_COMPRESSION_LEVEL', 9))
+CONTENT_COMPRESSION_MIN_CHARS = int(os.getenv('CONTENT_COMPRESSION_MIN_CHARS', 1024))
 
 # Media Download
 MEDIA_DOWNLOAD_DIR = os.getenv('MEDIA_DOWNLOAD_DIR', './downloads')
 MAX_MEDIA_SIZE = 100 * 1024 * 1024  # 100MB
 
+# Image variants: WebP sizes (max edge, px) generated on a process pool after download
+IMAGE_VARIANT_SIZES = tuple(int(size) for size in os.getenv('IMAGE_VARIANT_SIZES', '150,600').split(',') if size.strip())
+IMAGE_VARIANT_QUALITY = int(os.getenv('IMAGE_VARIANT_QUALITY', 80))
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+
+# Progress events (minimum seconds between progress events)
+PROGRESS_MIN_INTERVAL = float(os.getenv('PROGRESS_MIN_INTERVAL', 1.0))
+
 # Logging
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -41,7 +41,9 @@ class CrawlerEngine:
                                 self.media_pipeline.download_media(
                                     media['url'],
                                     post_id,
-                                    task_id
+                                    task_id,
+                                    rate_limiter=crawler.rate_limiter,
+                                    retry_policy=crawler.retry_policy
                                 )
                         
                         total_posts += 1
@@ -56,6 +58,9 @@ class CrawlerEngine:
                 except Exception as e:
                     logger.error(f'Error processing URL {url}: {str(e)}')
             
+            # Write any buffered posts and progress before reporting completion
+            self.mongodb_pipeline.flush()
+            
             logger.info(f'Crawler task completed: {task_id}. Total posts: {total_posts}')
             return {
                 'success': True,
@@ -74,6 +79,13 @@ class CrawlerEngine:
     def close(self):
         """Close all connections"""
         self.mongodb_pipeline.close()
+        self.media_pipeline.close()
+
 
-# Singleton instance
-engine = CrawlerEngine()
+def __getattr__(name):
+    """Shared engine, created on first use (it opens a MongoDB client)"""
+    if name != 'engine':
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    global engine
+    engine = CrawlerEngine()
+    return engine
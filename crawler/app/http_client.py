@@ -0,0 +1,165 @@
+"""
+Shared HTTP client for page, image and media requests
+
+One place for connection pooling, default headers and timeouts. Sessions
+keep idle connections alive per host (HTTP_POOL_MAXSIZE each, for up to
+HTTP_POOL_CONNECTIONS hosts), so repeated requests to a forum or image
+host skip the TCP and TLS handshakes. Host names are resolved once per
+HTTP_DNS_CACHE_TTL seconds instead of on every new connection.
+"""
+
+import ipaddress
+import socket
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+from app import metrics
+from app.config import (
+    USER_AGENT,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_DNS_CACHE_TTL,
+    HTTP_VERIFY_TLS,
+)
+
+DEFAULT_HEADERS = {
+    'User-Agent': USER_AGENT,
+}
+
+IMAGE_HEADERS = {
+    'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
+    'Accept-Language': 'zh-CN,zh;q=0.9',
+    'Cache-Control': 'no-cache',
+    'Pragma': 'no-cache',
+}
+
+
+class DnsCache:
+    """Host name -> address cache; failed connections drop the cached address"""
+
+    def __init__(self, ttl=HTTP_DNS_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, host, port):
+        """Address to connect to for host; IP literals and a disabled cache return host unchanged"""
+        if self.ttl <= 0 or _is_ip(host):
+            return host
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(host)
+        if entry and entry[1] > now:
+            metrics.DNS_LOOKUPS.labels('hit').inc()
+            return entry[0]
+        metrics.DNS_LOOKUPS.labels('miss').inc()
+        address = socket.getaddrinfo(host, port, allowed_gai_family(), socket.SOCK_STREAM)[0][4][0]
+        with self._lock:
+            self._entries[host] = (address, now + self.ttl)
+        return address
+
+    def invalidate(self, host):
+        with self._lock:
+            self._entries.pop(host, None)
+
+
+def _is_ip(host):
+    try:
+        ipaddress.ip_address(host.strip('[]'))
+        return True
+    except ValueError:
+        return False
+
+
+dns_cache = DnsCache()
+
+
+class _CachedDnsMixin:
+    """Connect to the cached address; Host header, SNI and certificate checks still use the host name"""
+
+    def _new_conn(self):
+        host = self._dns_host
+        try:
+            address = dns_cache.resolve(host, self.port)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        self._dns_host = address
+        try:
+            sock = super()._new_conn()
+        except (NewConnectionError, ConnectTimeoutError):
+            # The host may have moved; resolve again on the next attempt
+            dns_cache.invalidate(host)
+            raise
+        finally:
+            self._dns_host = host
+        metrics.CONNECTIONS_OPENED.labels(self.scheme).inc()
+        return sock
+
+
+class _HTTPConnection(_CachedDnsMixin, HTTPConnection):
+    scheme = 'http'
+
+
+class _HTTPSConnection(_CachedDnsMixin, HTTPSConnection):
+    scheme = 'https'
+
+
+class _HTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _HTTPConnection
+
+
+class _HTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _HTTPSConnection
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools resolve host names through dns_cache"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _HTTPConnectionPool, 'https': _HTTPSConnectionPool}
+
+
+class HttpClient(requests.Session):
+    """requests.Session with pooled keep-alive connections and a default timeout"""
+
+    def __init__(self, pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, headers=None,
+                 timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)):
+        super().__init__()
+        self.headers.update(DEFAULT_HEADERS)
+        self.headers.update(headers or {})
+        self.verify = HTTP_VERIFY_TLS
+        self.timeout = timeout
+        adapter = PooledAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        # Per request, otherwise REQUESTS_CA_BUNDLE in the environment overrides verify=False
+        if kwargs.get('verify') is None:
+            kwargs['verify'] = self.verify
+        return super().request(method, url, **kwargs)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_session():
+    """Process-wide client shared by page, image and media requests (never closed)"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = HttpClient()
+        return _shared
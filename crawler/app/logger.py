@@ -5,6 +5,8 @@ class Logger:
     def __init__(self, name):
         self.logger = logging.getLogger(name)
         self.logger.setLevel(logging.DEBUG)
+        # Avoid duplicate lines when the host script configures the root logger
+        self.logger.propagate = False
         
         # Console handler
         ch = logging.StreamHandler()
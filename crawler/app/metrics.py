@@ -0,0 +1,320 @@
+"""
+Process-wide crawler metrics in the Prometheus text exposition format
+
+Metrics are exposed either by a small HTTP listener (start_http_server)
+or written to a file for node_exporter's textfile collector
+(write_textfile / start_textfile_writer).
+"""
+
+import http.server
+import math
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text format"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def labels(self, *values):
+        """Child metric for one combination of label values"""
+        key = tuple(str(value) for value in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}')
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+            return child
+
+    def _items(self):
+        with self._lock:
+            return list(self._children.items())
+
+    def samples(self):
+        for key, child in self._items():
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.get())}'
+
+
+class _Value:
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self._lock:
+            self._value = value
+
+    def get(self):
+        with self._lock:
+            return self._value
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._function = None
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def set_function(self, function):
+        """Read the (unlabelled) value from function() at render time"""
+        self._function = function
+
+    def samples(self):
+        if self._function is None:
+            yield from super().samples()
+            return
+        try:
+            yield f'{self.name} {_format_value(self._function())}'
+        except Exception:
+            pass
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[index] += 1
+                    break
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def samples(self):
+        for key, child in self._items():
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labelnames, key)
+            yield f'{self.name}_sum{labels} {_format_value(total)}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+# --- Crawler metrics ---
+
+REQUEST_SECONDS = Histogram(
+    'crawler_request_duration_seconds',
+    'Time until response headers, per attempt',
+    ['kind', 'host'],
+)
+REQUESTS_IN_FLIGHT = Gauge('crawler_requests_in_flight', 'Requests currently being sent', ['kind', 'host'])
+RESPONSE_BYTES = Counter('crawler_response_bytes_total', 'Response body bytes received', ['kind'])
+CONNECTIONS_OPENED = Counter(
+    'crawler_http_connections_opened_total',
+    'New HTTP connections (a TCP and, for https, TLS handshake each)',
+    ['scheme'],
+)
+DNS_LOOKUPS = Counter('crawler_dns_lookups_total', 'Host name resolutions by DNS cache result', ['result'])
+REQUEST_ERRORS = Counter(
+    'crawler_request_errors_total',
+    'Failed request attempts by error class',
+    ['kind', 'class'],
+)
+STAGE_SECONDS = Histogram(
+    'crawler_stage_duration_seconds',
+    'Duration of crawl stages (fetch, parse, images, db)',
+    ['stage'],
+)
+MONGO_WRITE_SECONDS = Histogram(
+    'crawler_mongo_write_duration_seconds',
+    'MongoDB write latency',
+    ['collection', 'operation'],
+)
+QUEUE_DEPTH = Gauge('crawler_queue_depth', 'Items waiting in crawler queues', ['queue'])
+JOB_QUEUE_DEPTH = Gauge('crawler_job_queue_depth', 'Jobs waiting in the worker job queue')
+TASKS_RUNNING = Gauge('crawler_tasks_running', 'Crawler tasks currently running')
+TASKS_TOTAL = Counter('crawler_tasks_total', 'Finished crawler tasks', ['result'])
+
+
+def host_of(url):
+    return urlparse(url).netloc.lower()
+
+
+def classify_error(error=None, status=None):
+    """Error class label for a failed attempt"""
+    if error is not None:
+        if isinstance(error, requests.Timeout):
+            return 'timeout'
+        if isinstance(error, requests.ConnectionError):
+            return 'connection'
+        return 'other'
+    if status in (429, 503):
+        return 'throttled'
+    return 'http_5xx' if status >= 500 else 'http_4xx'
+
+
+def track_request(kind, url, send):
+    """Call send() and record its latency, in-flight count and errors"""
+    host = host_of(url)
+    in_flight = REQUESTS_IN_FLIGHT.labels(kind, host)
+    in_flight.inc()
+    started = time.perf_counter()
+    try:
+        response = send()
+    except Exception as e:
+        REQUEST_ERRORS.labels(kind, classify_error(error=e)).inc()
+        raise
+    finally:
+        in_flight.dec()
+        REQUEST_SECONDS.labels(kind, host).observe(time.perf_counter() - started)
+    if response.status_code >= 400:
+        REQUEST_ERRORS.labels(kind, classify_error(status=response.status_code)).inc()
+    return response
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, addr='0.0.0.0'):
+    """Serve /metrics from a daemon thread; returns the server"""
+    server = http.server.ThreadingHTTPServer((addr, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+def write_textfile(path):
+    """Atomically write all metrics to path (for the textfile collector)"""
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(REGISTRY.render())
+    os.replace(temp_path, path)
+
+
+def start_textfile_writer(path, interval=15.0):
+    """Rewrite path every interval seconds from a daemon thread"""
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                write_textfile(path)
+            except OSError:
+                pass
+
+    threading.Thread(target=loop, name='metrics-textfile', daemon=True).start()
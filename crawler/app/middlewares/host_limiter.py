@@ -0,0 +1,30 @@
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+class HostLimiter:
+    """Cap the number of in-flight requests per host across worker threads"""
+
+    def __init__(self, per_host=4):
+        self.per_host = max(1, int(per_host))
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, host):
+        with self._lock:
+            sem = self._semaphores.get(host)
+            if sem is None:
+                sem = threading.BoundedSemaphore(self.per_host)
+                self._semaphores[host] = sem
+            return sem
+
+    @contextmanager
+    def slot(self, url):
+        """Hold one concurrency slot for the host of url"""
+        sem = self._semaphore(urlparse(url).netloc.lower())
+        sem.acquire()
+        try:
+            yield
+        finally:
+            sem.release()
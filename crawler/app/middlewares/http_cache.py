@@ -0,0 +1,181 @@
+import hashlib
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from app.logger import logger
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    content_type TEXT,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+'''
+
+
+class HttpCache:
+    """
+    On-disk HTTP cache with conditional revalidation
+
+    Bodies are stored with their ETag / Last-Modified validators. Cached URLs
+    are revalidated with If-None-Match / If-Modified-Since and a 304 is served
+    from disk. Total body size is bounded with least-recently-used eviction.
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, 'index.sqlite3')
+        self._local = threading.local()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _conn(self):
+        """One SQLite connection per thread, shared index across processes"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _key(self, url):
+        return hashlib.sha1(url.encode()).hexdigest()
+
+    def _body_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f'{key}.body')
+
+    def get(self, session, url, **kwargs):
+        """
+        GET url through the cache
+
+        Returns a requests.Response; a 304 revalidation is turned into a 200
+        response carrying the cached body
+        """
+        key = self._key(url)
+        entry = self._conn().execute(
+            'SELECT etag, last_modified, content_type FROM entries WHERE key = ?', (key,)
+        ).fetchone()
+        body_path = self._body_path(key)
+        if entry and not os.path.exists(body_path):
+            self._delete(key)
+            entry = None
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry:
+            etag, last_modified, _ = entry
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        response = session.get(url, headers=headers, **kwargs)
+
+        if entry and response.status_code == 304:
+            try:
+                cached = self._cached_response(response, body_path, entry[2])
+            except FileNotFoundError:
+                # Evicted between lookup and read, fetch the full page again
+                self._delete(key)
+                return session.get(url, **kwargs)
+            self._conn().execute(
+                'UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), key)
+            )
+            self._conn().commit()
+            logger.debug(f'HTTP cache revalidated: {url}')
+            return cached
+
+        if response.status_code == 200:
+            self._store(key, url, response)
+        return response
+
+    def _cached_response(self, not_modified, body_path, content_type):
+        """Build a 200 response from the cached body"""
+        with open(body_path, 'rb') as f:
+            body = f.read()
+        response = requests.Response()
+        response.status_code = 200
+        response.url = not_modified.url
+        response.request = not_modified.request
+        response.headers = CaseInsensitiveDict(not_modified.headers)
+        response.headers.pop('Content-Encoding', None)
+        response.headers['Content-Length'] = str(len(body))
+        if content_type:
+            response.headers['Content-Type'] = content_type
+        response.raw = io.BytesIO(body)
+        response.from_cache = True
+        return response
+
+    def _store(self, key, url, response):
+        """Cache a 200 response that carries validators"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        body = response.content
+        if len(body) > self.max_bytes:
+            return
+
+        body_path = self._body_path(key)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(body_path), suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(body)
+            os.replace(temp_path, body_path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO entries '
+                '(key, url, etag, last_modified, content_type, size, accessed) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, url, etag, last_modified, response.headers.get('Content-Type'),
+                 len(body), time.time())
+            )
+        self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits max_bytes"""
+        conn = self._conn()
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute(
+            'SELECT key, size FROM entries ORDER BY accessed'
+        ).fetchall():
+            self._delete(key)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def _delete(self, key):
+        conn = self._conn()
+        with conn:
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+        try:
+            os.remove(self._body_path(key))
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        """Close this thread's index connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
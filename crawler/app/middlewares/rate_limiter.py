@@ -0,0 +1,150 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+# Responses telling us the host wants fewer requests
+THROTTLE_STATUSES = (429, 503)
+# Latency increases smaller than this (seconds) are treated as noise
+MIN_LATENCY_SPIKE = 0.1
+
+
+class _HostState:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.latency = None
+        self.base_latency = None
+
+
+class HostRateLimiter:
+    """
+    Per-host token bucket whose rate adapts AIMD-style
+
+    Every request waits for a token from its host's bucket. Each successful
+    response raises the host's rate additively (about `increase` requests/s
+    per second of successful traffic); a 429/503, a timeout or a
+    latency spike (smoothed latency above latency_factor times the baseline)
+    cuts it by `decrease`, at most once per cooldown. A Retry-After
+    header pauses the host for the requested time.
+    """
+
+    def __init__(self, initial_rate=1.0, min_rate=0.2, max_rate=20.0, burst=2,
+                 increase=1.0, decrease=0.5, latency_factor=3.0, cooldown=2.0):
+        self.min_rate = min_rate
+        self.max_rate = max(min_rate, max_rate)
+        self.initial_rate = min(max(initial_rate, min_rate), self.max_rate)
+        self.burst = max(1, burst)
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_delay(cls, delay_ms, **kwargs):
+        """Start at one request per delay_ms; 0 starts at max_rate"""
+        if delay_ms and delay_ms > 0:
+            kwargs['initial_rate'] = 1000.0 / delay_ms
+        else:
+            kwargs['initial_rate'] = kwargs.get('max_rate', 20.0)
+        return cls(**kwargs)
+
+    def _state(self, url):
+        host = urlparse(url).netloc.lower()
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.initial_rate, self.burst)
+        return state
+
+    def wait(self, url):
+        """Block until a request to the host of url may be sent"""
+        while True:
+            with self._lock:
+                state = self._state(url)
+                now = time.monotonic()
+                state.tokens = min(self.burst, state.tokens + (now - state.updated) * state.rate)
+                state.updated = now
+                if now < state.paused_until:
+                    delay = state.paused_until - now
+                elif state.tokens >= 1:
+                    state.tokens -= 1
+                    return
+                else:
+                    delay = (1 - state.tokens) / state.rate
+            time.sleep(delay)
+
+    def request(self, url, send):
+        """
+        Wait for a token, call send() and adapt to its response
+
+        Returns:
+            the response returned by send()
+        """
+        self.wait(url)
+        started = time.monotonic()
+        try:
+            response = send()
+        except requests.Timeout:
+            self.observe(url, None, time.monotonic() - started)
+            raise
+        self.observe(url, response.status_code, time.monotonic() - started,
+                     response.headers.get('Retry-After'))
+        return response
+
+    def observe(self, url, status, elapsed, retry_after=None):
+        """
+        Adapt the host's rate to a finished request
+
+        Args:
+            status: HTTP status code, None when the request timed out
+            elapsed: seconds until the response headers arrived
+            retry_after: Retry-After header value, if any
+        """
+        with self._lock:
+            state = self._state(url)
+            now = time.monotonic()
+            if status is None or status in THROTTLE_STATUSES:
+                self._slow_down(state, now)
+                pause = _parse_retry_after(retry_after)
+                if pause:
+                    state.paused_until = max(state.paused_until, now + pause)
+                return
+
+            state.latency = elapsed if state.latency is None else 0.7 * state.latency + 0.3 * elapsed
+            if state.base_latency is None or state.latency < state.base_latency:
+                state.base_latency = state.latency
+            else:
+                # Let the baseline follow a lasting change in network conditions
+                state.base_latency += 0.01 * (state.latency - state.base_latency)
+            spike = state.latency - state.base_latency
+            if state.latency > state.base_latency * self.latency_factor and spike > MIN_LATENCY_SPIKE:
+                self._slow_down(state, now)
+            else:
+                state.rate = min(self.max_rate, state.rate + self.increase / state.rate)
+
+    def _slow_down(self, state, now):
+        # In-flight requests sent at the old rate fail together; count them once
+        if now - state.last_decrease < self.cooldown:
+            return
+        state.rate = max(self.min_rate, state.rate * self.decrease)
+        state.tokens = min(state.tokens, 0)
+        state.last_decrease = now
+
+    def rate(self, url):
+        """Current rate for the host of url, in requests per second"""
+        with self._lock:
+            return self._state(url).rate
+
+
+def _parse_retry_after(value):
+    """Retry-After in seconds; HTTP-date values are ignored"""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return 0.0
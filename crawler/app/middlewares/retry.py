@@ -0,0 +1,168 @@
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+# Statuses worth retrying: throttling and transient server/gateway errors
+RETRYABLE_STATUSES = frozenset((408, 425, 429, 500, 502, 503, 504))
+RETRYABLE_ERRORS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without sending a request while a host's circuit is open"""
+
+
+class IncompleteDownloadError(requests.exceptions.ChunkedEncodingError):
+    """The body ended before Content-Length bytes were read (connection cut); retryable"""
+
+
+def is_retryable(error=None, status=None):
+    """Classify a failed attempt: a requests exception or an HTTP status"""
+    if error is not None:
+        return isinstance(error, RETRYABLE_ERRORS) and not isinstance(error, CircuitOpenError)
+    return status in RETRYABLE_STATUSES
+
+
+class RetryBudget:
+    """Retries allowed for one task, shared by all of its requests"""
+
+    def __init__(self, max_retries):
+        self.max_retries = max_retries
+        self.spent = 0
+        self._lock = threading.Lock()
+
+    def spend(self):
+        """Take one retry; False once the budget is exhausted"""
+        with self._lock:
+            if self.spent >= self.max_retries:
+                return False
+            self.spent += 1
+            return True
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker
+
+    After failure_threshold consecutive failed attempts the host's circuit
+    opens and requests fail immediately. After reset_timeout seconds one
+    trial request is let through (half-open): success closes the circuit,
+    failure opens it for another reset_timeout.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._failures = {}
+        self._opened_at = {}
+        self._trial = set()
+        self._lock = threading.Lock()
+
+    def allow(self, url):
+        """Whether a request to the host of url may be sent now"""
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return True
+            if host in self._trial or time.monotonic() - opened_at < self.reset_timeout:
+                return False
+            self._trial.add(host)
+            return True
+
+    def record_success(self, url):
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            self._failures.pop(host, None)
+            self._opened_at.pop(host, None)
+            self._trial.discard(host)
+
+    def record_failure(self, url):
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            failures = self._failures[host] = self._failures.get(host, 0) + 1
+            if host in self._trial or failures >= self.failure_threshold:
+                self._opened_at[host] = time.monotonic()
+                self._trial.discard(host)
+
+    def release(self, url):
+        """End a half-open trial whose outcome says nothing about the host"""
+        with self._lock:
+            self._trial.discard(urlparse(url).netloc.lower())
+
+    def is_open(self, url):
+        with self._lock:
+            return urlparse(url).netloc.lower() in self._opened_at
+
+
+class RetryPolicy:
+    """
+    Retry transient failures with exponential backoff and full jitter
+
+    Attempt n waits a random time in [0, min(max_delay, base_delay * 2**n)],
+    or the server's Retry-After if that is longer. Retries draw from a
+    shared RetryBudget; every attempt is reported to the CircuitBreaker.
+    """
+
+    def __init__(self, attempts=3, base_delay=0.5, max_delay=10.0, budget=None, breaker=None):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.breaker = breaker
+
+    def backoff(self, attempt, retry_after=None):
+        """Seconds to wait before retry number attempt (0-based)"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        try:
+            delay = max(delay, min(self.max_delay, float(retry_after)))
+        except (TypeError, ValueError):
+            pass
+        return delay
+
+    def call(self, url, send):
+        """
+        Call send() until it succeeds or the failure is not worth retrying
+
+        Returns the last response; a response with a retryable status is
+        returned when attempts or the budget run out. Raises the last
+        exception when no response was received, and CircuitOpenError when
+        the host's circuit is open.
+        """
+        for attempt in range(self.attempts):
+            if self.breaker and not self.breaker.allow(url):
+                raise CircuitOpenError(f'Circuit open for {urlparse(url).netloc}')
+            error = response = None
+            try:
+                response = send()
+            except Exception as e:
+                if not is_retryable(error=e):
+                    if self.breaker:
+                        self.breaker.release(url)
+                    raise
+                error = e
+            else:
+                if not is_retryable(status=response.status_code):
+                    if self.breaker:
+                        self.breaker.record_success(url)
+                    return response
+
+            if self.breaker:
+                self.breaker.record_failure(url)
+            last_attempt = attempt == self.attempts - 1
+            if last_attempt or (self.budget and not self.budget.spend()):
+                break
+            retry_after = response.headers.get('Retry-After') if response is not None else None
+            if response is not None:
+                response.close()
+            time.sleep(self.backoff(attempt, retry_after))
+
+        if error is not None:
+            raise error
+        return response
@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from app.config import IMAGE_VARIANT_SIZES, IMAGE_VARIANT_QUALITY, IMAGE_VARIANT_WORKERS
+from app.logger import logger
+
+
+def variant_paths(source_path, output_dir, sizes):
+    """Output path of each variant size: <name>_<size>.webp"""
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return {size: os.path.join(output_dir, f'{stem}_{size}.webp') for size in sizes}
+
+
+def make_variants(source_path, output_dir, sizes, quality):
+    """
+    Write WebP variants of an image, each fitting in size x size
+
+    Variants already newer than the source are skipped. JPEGs are decoded
+    at the smallest 1/2, 1/4 or 1/8 scale that still covers the largest
+    missing variant (draft mode), so full-resolution pixels are never
+    decoded for thumbnails. Runs in a worker process.
+    """
+    paths = variant_paths(source_path, output_dir, sizes)
+    source_mtime = os.path.getmtime(source_path)
+    missing = sorted(
+        (size for size, path in paths.items()
+         if not os.path.exists(path) or os.path.getmtime(path) < source_mtime),
+        reverse=True,
+    )
+    if not missing:
+        return paths
+
+    os.makedirs(output_dir, exist_ok=True)
+    with Image.open(source_path) as source:
+        source.draft('RGB', (missing[0], missing[0]))
+        has_alpha = 'A' in source.getbands() or 'transparency' in source.info
+        image = source.convert('RGBA' if has_alpha else 'RGB')
+    # Largest first: each variant is resized from the previous one
+    for size in missing:
+        image.thumbnail((size, size), Image.LANCZOS)
+        temp_path = f'{paths[size]}.{os.getpid()}.tmp'
+        image.save(temp_path, 'WEBP', quality=quality, method=4)
+        os.replace(temp_path, paths[size])
+    return paths
+
+
+class ImageVariantPipeline:
+    """
+    Generate resized WebP variants of downloaded images off the download path
+
+    Work runs on a process pool (spawned, safe to start from threaded
+    workers) created on first use; with workers=0 variants are generated
+    inline.
+    """
+
+    def __init__(self, output_dir, sizes=IMAGE_VARIANT_SIZES, quality=IMAGE_VARIANT_QUALITY,
+                 workers=IMAGE_VARIANT_WORKERS):
+        self.output_dir = output_dir
+        self.sizes = tuple(sorted(sizes))
+        self.quality = quality
+        self.workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def paths(self, source_path):
+        """Variant paths of source_path, by size (files may not exist yet)"""
+        return variant_paths(source_path, self.output_dir, self.sizes)
+
+    def submit(self, source_path):
+        """Queue variant generation; returns a Future, or the paths when run inline"""
+        args = (source_path, self.output_dir, self.sizes, self.quality)
+        if self.workers <= 0:
+            try:
+                return make_variants(*args)
+            except Exception as e:
+                logger.warning(f'Error creating variants of {source_path}: {str(e)}')
+                return None
+        future = self._executor().submit(make_variants, *args)
+        future.add_done_callback(lambda f: self._log_failure(f, source_path))
+        return future
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+            return self._pool
+
+    @staticmethod
+    def _log_failure(future, source_path):
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f'Error creating variants of {source_path}: {str(future.exception())}')
+
+    def close(self, wait=True):
+        """Shut down the pool; with wait, queued variants are finished first"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
@@ -1,9 +1,12 @@
+import functools
 import os
-import requests
-from PIL import Image
-from io import BytesIO
+import tempfile
+from app import metrics
 from app.config import MEDIA_DOWNLOAD_DIR, MAX_MEDIA_SIZE
+from app.http_client import shared_session
 from app.logger import logger
+from app.middlewares.retry import IncompleteDownloadError
+from app.pipelines.image_variants import ImageVariantPipeline
 
 class MediaDownloadPipeline:
     """Pipeline for downloading and processing media"""
@@ -11,18 +14,46 @@ class MediaDownloadPipeline:
     def __init__(self):
         self.download_dir = MEDIA_DOWNLOAD_DIR
         os.makedirs(self.download_dir, exist_ok=True)
+        # Thumbnails and other sizes are generated on a process pool, off the download path
+        self.variants = ImageVariantPipeline(os.path.join(self.download_dir, 'thumbnails'))
     
-    def download_media(self, url, post_id, task_id):
-        """Download media from URL"""
+    def download_media(self, url, post_id, task_id, rate_limiter=None, retry_policy=None):
+        """
+        Download media from URL, paced by rate_limiter and retried by retry_policy when given
+
+        The body is streamed to a temp file that is moved into place only once
+        it is complete, so failed or truncated downloads leave no partial file.
+        """
         try:
             logger.info(f'Downloading media from: {url}')
             
-            response = requests.get(url, timeout=30, stream=True)
+            send = functools.partial(
+                metrics.track_request, 'media', url, lambda: shared_session().get(url, stream=True)
+            )
+            if rate_limiter:
+                send = functools.partial(rate_limiter.request, url, send)
+            streamed = None
+            
+            def fetch():
+                """Request and read the whole body; a truncated body raises a retryable error"""
+                nonlocal streamed
+                with send() as response:
+                    if not response.ok:
+                        return response
+                    declared_length = response.headers.get('content-length')
+                    if declared_length and declared_length.isdigit() and int(declared_length) > MAX_MEDIA_SIZE:
+                        streamed = (int(declared_length), None)
+                        return response
+                    streamed = self._stream_to_temp(response)
+                    self._check_complete(response, *streamed)
+                    return response
+            
+            response = retry_policy.call(url, fetch) if retry_policy else fetch()
             response.raise_for_status()
             
-            # Check file size
-            file_size = int(response.headers.get('content-length', 0))
-            if file_size > MAX_MEDIA_SIZE:
+            # Content-Length may be missing, so the size is also capped while streaming
+            file_size, temp_path = streamed
+            if temp_path is None:
                 logger.warning(f'File too large: {file_size} bytes')
                 return None
             
@@ -33,15 +64,15 @@ class MediaDownloadPipeline:
             # Save media
             filename = self._generate_filename(post_id, task_id, media_type)
             filepath = os.path.join(self.download_dir, filename)
+            os.replace(temp_path, filepath)
             
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
-            # Create thumbnail for images
+            # Queue WebP variants for images; their paths are known before they are written
             thumbnail = None
+            variants = {}
             if media_type == 'image':
-                thumbnail = self._create_thumbnail(filepath)
+                self.variants.submit(filepath)
+                variants = self.variants.paths(filepath)
+                thumbnail = variants[min(variants)] if variants else None
             
             logger.info(f'Media saved to: {filepath}')
             
@@ -52,11 +83,54 @@ class MediaDownloadPipeline:
                 'size': os.path.getsize(filepath),
                 'mimeType': content_type,
                 'thumbnail': thumbnail,
+                'variants': {str(size): path for size, path in variants.items()},
             }
         except Exception as e:
             logger.error(f'Error downloading media: {str(e)}')
             return None
     
+    def _stream_to_temp(self, response):
+        """
+        Write the body to a temp file in the download directory
+
+        Stops as soon as the body exceeds MAX_MEDIA_SIZE. The temp file is
+        removed on any failure.
+
+        Returns:
+            tuple: (bytes read, temp file path or None if the file is too large)
+        """
+        fd, temp_path = tempfile.mkstemp(suffix='.part', dir=self.download_dir)
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    size += len(chunk)
+                    metrics.RESPONSE_BYTES.labels('media').inc(len(chunk))
+                    if size > MAX_MEDIA_SIZE:
+                        break
+                    f.write(chunk)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        if size > MAX_MEDIA_SIZE:
+            os.remove(temp_path)
+            return size, None
+        return size, temp_path
+    
+    def _check_complete(self, response, size, temp_path):
+        """
+        Raise IncompleteDownloadError (and remove the temp file) when fewer
+        bytes than Content-Length were read; skipped for encoded bodies
+        """
+        declared_length = response.headers.get('content-length')
+        if temp_path is None or not declared_length or not declared_length.isdigit():
+            return
+        if response.headers.get('content-encoding', 'identity').lower() != 'identity':
+            return
+        if size != int(declared_length):
+            os.remove(temp_path)
+            raise IncompleteDownloadError(f'Incomplete media body: {size}/{declared_length} bytes')
+    
     def _get_media_type(self, content_type):
         """Determine media type from content-type"""
         if 'image' in content_type:
@@ -77,19 +151,6 @@ class MediaDownloadPipeline:
         filename = f"{task_id}_{post_id}_{uuid.uuid4().hex[:8]}{ext}"
         return filename
     
-    def _create_thumbnail(self, filepath):
-        """Create thumbnail for image"""
-        try:
-            img = Image.open(filepath)
-            img.thumbnail((150, 150))
-            
-            thumb_dir = os.path.join(self.download_dir, 'thumbnails')
-            os.makedirs(thumb_dir, exist_ok=True)
-            
-            thumb_path = os.path.join(thumb_dir, os.path.basename(filepath))
-            img.save(thumb_path)
-            
-            return thumb_path
-        except Exception as e:
-            logger.warning(f'Error creating thumbnail: {str(e)}')
-            return None
+    def close(self):
+        """Finish queued variant generation"""
+        self.variants.close()
@@ -1,50 +1,267 @@
-from pymongo import MongoClient
-from app.config import MONGODB_URI
+import threading
+import time
+
+from bson import ObjectId
+from pymongo import InsertOne, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+from app import metrics
+from app.config import (
+    MONGODB_URI,
+    MONGO_BULK_BATCH_SIZE,
+    MONGO_BULK_FLUSH_INTERVAL,
+    MONGO_WRITE_CONCERN,
+    MONGO_WRITE_JOURNAL,
+)
 from app.logger import logger
 
+# Duplicate key: an insert with its own _id already written by an earlier attempt
+DUPLICATE_KEY = 11000
+# Ids returned by save_post that turned out to belong to an existing post
+STORED_ID_CACHE_SIZE = 10000
+
+
 class MongoDBPipeline:
-    """Pipeline for saving data to MongoDB"""
-    
-    def __init__(self):
+    """
+    Pipeline for saving data to MongoDB
+
+    Writes are buffered and sent as unordered bulk_write batches. A batch is
+    flushed when it reaches batch_size operations, when flush_interval seconds
+    have passed since the last flush, and on close().
+
+    Operations that fail are queued again for the next flush (inserts that
+    hit a duplicate key were already written and are dropped). flush() and
+    close() raise the write error; size and timer flushes only log it.
+    """
+
+    def __init__(self, batch_size=MONGO_BULK_BATCH_SIZE, flush_interval=MONGO_BULK_FLUSH_INTERVAL,
+                 write_concern=MONGO_WRITE_CONCERN, journal=MONGO_WRITE_JOURNAL):
         self.client = MongoClient(MONGODB_URI)
-        self.db = self.client['forum-crawler']
+        self.db = self.client.get_database(
+            'forum-crawler',
+            write_concern=WriteConcern(w=write_concern, j=journal if write_concern != 0 else None)
+        )
         self.posts_collection = self.db['posts']
         self.media_collection = self.db['media']
-    
+        self.task_collection = self.db['crawler_tasks']
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # Held for a whole flush so size, timer and close() flushes never interleave
+        self._flush_lock = threading.Lock()
+        # (sourceUrl or None, post id, operation)
+        self._pending_posts = []
+        # sourceUrl -> id of posts queued or being written, not yet visible in the collection
+        self._queued_ids = {}
+        self._writing_ids = {}
+        # id returned by save_post -> id of the stored post with the same sourceUrl
+        self._stored_ids = {}
+        # Media documents; postId is resolved through _stored_ids when written
+        self._pending_media = []
+        self._pending_progress = {}
+        self._closed = threading.Event()
+        self._flusher = None
+
     def save_post(self, task_id, post_data):
-        """Save post to MongoDB"""
-        try:
-            post_data['taskId'] = task_id
-            result = self.posts_collection.insert_one(post_data)
-            logger.info(f'Post saved with ID: {result.inserted_id}')
-            return result.inserted_id
-        except Exception as e:
-            logger.error(f'Error saving post: {str(e)}')
-            raise
-    
+        """
+        Queue a post upsert keyed by sourceUrl
+
+        Returns a post id generated client side, so no query is needed per
+        post. Posts queued with the same sourceUrl share one id. If the post
+        already exists the flush maps the returned id to the stored one, and
+        media saved under the returned id are attached to the stored post.
+        """
+        post_data['taskId'] = task_id
+        post_id = post_data.pop('_id', None) or ObjectId()
+        source_url = post_data.get('sourceUrl')
+        if not source_url:
+            self._enqueue(self._pending_posts, (None, post_id, InsertOne({'_id': post_id, **post_data})))
+            return post_id
+
+        with self._lock:
+            post_id = self._queued_ids.get(source_url) or self._writing_ids.get(source_url) or post_id
+            self._queued_ids[source_url] = post_id
+        self._enqueue(self._pending_posts, (source_url, post_id, UpdateOne(
+            {'sourceUrl': source_url},
+            {'$set': post_data, '$setOnInsert': {'_id': post_id}},
+            upsert=True
+        )))
+        return post_id
+
     def save_media(self, task_id, post_id, media_data):
-        """Save media to MongoDB"""
-        try:
-            media_data['taskId'] = task_id
-            media_data['postId'] = post_id
-            result = self.media_collection.insert_one(media_data)
-            logger.info(f'Media saved with ID: {result.inserted_id}')
-            return result.inserted_id
-        except Exception as e:
-            logger.error(f'Error saving media: {str(e)}')
-            raise
-    
+        """Queue a media insert"""
+        media_data['taskId'] = task_id
+        media_data['postId'] = post_id
+        media_id = media_data.setdefault('_id', ObjectId())
+        self._enqueue(self._pending_media, media_data)
+        return media_id
+
     def update_task_progress(self, task_id, progress_data):
-        """Update task progress"""
+        """Queue a task progress update; updates for the same task are merged"""
+        with self._lock:
+            self._pending_progress.setdefault(task_id, {}).update(progress_data)
+            pending = len(self._pending_progress)
+        self._start_flusher()
+        if pending >= self.batch_size:
+            self._flush_logged()
+
+    def _enqueue(self, pending, item):
+        with self._lock:
+            pending.append(item)
+            size = len(pending)
+        self._start_flusher()
+        if size >= self.batch_size:
+            self._flush_logged()
+
+    def _start_flusher(self):
+        """Start the background thread that flushes on the time threshold"""
+        if self._flusher is None and self.flush_interval > 0:
+            with self._lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                    self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.flush_interval):
+            self._flush_logged()
+
+    def _flush_logged(self):
+        """Flush on a size or time threshold; failures are logged and retried on the next flush"""
+        try:
+            self.flush()
+        except Exception:
+            pass
+
+    def flush(self):
+        """Write all buffered operations; raises if any operation failed (it stays queued)"""
+        with self._flush_lock:
+            self._flush()
+
+    def _flush(self):
+        with self._lock:
+            posts, self._pending_posts = self._pending_posts, []
+            media, self._pending_media = self._pending_media, []
+            progress, self._pending_progress = self._pending_progress, {}
+            self._writing_ids, self._queued_ids = self._queued_ids, {}
+
+        failed_posts, failed_media, failed_progress = posts, media, progress
+        error = None
         try:
-            task_collection = self.db['crawler_tasks']
-            task_collection.update_one(
-                {'_id': task_id},
-                {'$set': progress_data}
-            )
+            failed_posts, error = self._write_posts(posts)
+            # Posts are written first so media of an existing post get its stored id
+            for doc in media:
+                doc['postId'] = self._stored_ids.get(doc['postId'], doc['postId'])
+            failed, media_error = self._bulk_write(self.media_collection, [InsertOne(doc) for doc in media])
+            failed_media = [media[i] for i in failed]
+            tasks = list(progress.items())
+            failed, task_error = self._bulk_write(self.task_collection, [
+                UpdateOne({'_id': task_id}, {'$set': data}) for task_id, data in tasks
+            ])
+            failed_progress = dict(tasks[i] for i in failed)
+            error = error or media_error or task_error
         except Exception as e:
-            logger.error(f'Error updating task progress: {str(e)}')
-    
+            logger.error(f'Error flushing MongoDB writes: {str(e)}')
+            error = e
+        finally:
+            with self._lock:
+                self._requeue(failed_posts, failed_media, failed_progress)
+                self._writing_ids = {}
+        if error is not None:
+            raise error
+
+    def _write_posts(self, posts):
+        """
+        Write post operations, mapping ids returned by save_post to existing posts
+
+        One $in query finds the posts already stored; a post inserted by
+        another writer between the query and the upsert is looked up again.
+        Returns (failed posts, error).
+        """
+        if not posts:
+            return [], None
+        urls = {source_url for source_url, _, _ in posts if source_url}
+        existing = self._existing_ids(urls)
+        failed, error, upserted = self._bulk_write(
+            self.posts_collection, [operation for _, _, operation in posts], with_upserted=True
+        )
+        failed_set = set(failed)
+        # Matched an existing post that the query did not see
+        raced = {
+            source_url for i, (source_url, _, _) in enumerate(posts)
+            if source_url and source_url not in existing and i not in upserted and i not in failed_set
+        }
+        existing.update(self._existing_ids(raced))
+        for source_url, post_id, _ in posts:
+            stored_id = existing.get(source_url)
+            if stored_id is not None and stored_id != post_id:
+                self._stored_ids[post_id] = stored_id
+                if len(self._stored_ids) > STORED_ID_CACHE_SIZE:
+                    del self._stored_ids[next(iter(self._stored_ids))]
+        return [posts[i] for i in failed], error
+
+    def _existing_ids(self, urls):
+        """sourceUrl -> _id of stored posts"""
+        if not urls:
+            return {}
+        return {
+            doc['sourceUrl']: doc['_id']
+            for doc in self.posts_collection.find({'sourceUrl': {'$in': list(urls)}}, {'_id': 1, 'sourceUrl': 1})
+        }
+
+    def _bulk_write(self, collection, operations, with_upserted=False):
+        """
+        Unordered bulk_write
+
+        Returns (indexes of operations to retry, error) and, with
+        with_upserted, the indexes of upserted operations.
+        """
+        failed, error, upserted = [], None, set()
+        if operations:
+            started = time.perf_counter()
+            try:
+                result = collection.bulk_write(operations, ordered=False)
+                metrics.MONGO_WRITE_SECONDS.labels(collection.name, 'bulk_write').observe(
+                    time.perf_counter() - started
+                )
+                upserted = set(result.upserted_ids or {})
+                logger.info(
+                    f'Bulk write to {collection.name}: {len(operations)} ops, '
+                    f'{result.upserted_count} upserted, {result.inserted_count} inserted, '
+                    f'{result.modified_count} modified'
+                )
+            except BulkWriteError as e:
+                errors = e.details.get('writeErrors', [])
+                upserted = {item['index'] for item in e.details.get('upserted', [])}
+                failed = [
+                    item['index'] for item in errors
+                    if not (item.get('code') == DUPLICATE_KEY and isinstance(operations[item['index']], InsertOne))
+                ]
+                if failed or e.details.get('writeConcernErrors'):
+                    logger.error(f'Bulk write to {collection.name} failed for {len(errors)}/{len(operations)} ops: '
+                                 f'{errors[0]["errmsg"] if errors else e}')
+                    error = e
+            except Exception as e:
+                logger.error(f'Error writing to {collection.name}: {str(e)}')
+                failed, error = list(range(len(operations))), e
+        return (failed, error, upserted) if with_upserted else (failed, error)
+
+    def _requeue(self, posts, media, progress):
+        """Put failed operations back in front of those queued since; call with self._lock held"""
+        self._pending_posts[:0] = posts
+        self._pending_media[:0] = media
+        for task_id, data in progress.items():
+            self._pending_progress[task_id] = {**data, **self._pending_progress.get(task_id, {})}
+        for source_url, post_id, _ in posts:
+            if source_url:
+                self._queued_ids.setdefault(source_url, post_id)
+
     def close(self):
-        """Close MongoDB connection"""
-        self.client.close()
+        """Flush pending writes and close MongoDB connection; raises if the final flush fails"""
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        try:
+            self.flush()
+        finally:
+            self.client.close()
@@ -0,0 +1,45 @@
+import cProfile
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+from app.logger import logger
+
+# Only one cProfile profiler can be active per process at a time
+_cprofile_lock = threading.Lock()
+
+
+@contextmanager
+def profile_task(task_id, output_dir):
+    """
+    Profile a task and write <task_id>.prof (cProfile, load with pstats)
+    and <task_id>.tracemalloc (tracemalloc snapshot, load with
+    tracemalloc.Snapshot.load) to output_dir
+
+    cProfile covers the calling thread only; when another task in the same
+    process is already being profiled, only the memory snapshot is taken.
+    tracemalloc covers all threads; if it was already tracing (another task
+    is profiled) it is left running.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    profiler = cProfile.Profile() if _cprofile_lock.acquire(blocking=False) else None
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(25)
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            _cprofile_lock.release()
+            profiler.dump_stats(os.path.join(output_dir, f'{task_id}.prof'))
+        else:
+            logger.warning(f'cProfile busy with another task, skipping CPU profile for {task_id}')
+        if tracemalloc.is_tracing():
+            tracemalloc.take_snapshot().dump(os.path.join(output_dir, f'{task_id}.tracemalloc'))
+        if started_tracing:
+            tracemalloc.stop()
+        logger.info(f'Profile for task {task_id} written to {output_dir}')
@@ -0,0 +1,106 @@
+import json
+import sys
+import threading
+import time
+
+from app.config import PROGRESS_MIN_INTERVAL
+
+# Every event line starts with this prefix so consumers can tell events from log output
+EVENT_PREFIX = '{"event":'
+
+# Overall progress range covered by each stage, in percent
+STAGE_RANGES = {
+    'threads': (0, 99),
+    'pages': (0, 40),
+    'images': (40, 95),
+    'saving': (95, 99),
+    'done': (100, 100),
+}
+
+
+class ProgressReporter:
+    """
+    Emit crawler progress as NDJSON events
+
+    update() merges intermediate progress into the current state and emits
+    at most one "progress" event per min_interval seconds; a stage change or
+    flush() emits immediately. Other events (title, crawled, ...) are written
+    as they happen. A disabled reporter tracks state but writes nothing.
+    """
+
+    def __init__(self, task_id, stream=None, min_interval=PROGRESS_MIN_INTERVAL, enabled=True):
+        self.task_id = task_id
+        self.stream = stream
+        self.enabled = enabled
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._state = {'stage': None}
+        self._stage_started = time.monotonic()
+        self._last_emit = 0.0
+        self._dirty = False
+
+    def update(self, stage=None, done=None, total=None, **fields):
+        """
+        Merge progress into the current state
+
+        Args:
+            stage: threads / pages / images / saving / done
+            done, total: items finished / expected in the current stage
+            fields: extra counters (e.g. bytesDownloaded)
+        """
+        with self._lock:
+            force = stage is not None and stage != self._state['stage']
+            if force:
+                self._state.update(stage=stage, done=0, total=0)
+                self._stage_started = time.monotonic()
+            if done is not None:
+                self._state['done'] = done
+            if total is not None:
+                self._state['total'] = total
+            self._state.update(fields)
+            self._dirty = True
+            now = time.monotonic()
+            if force or now - self._last_emit >= self.min_interval:
+                self._emit_progress(now)
+
+    def add(self, **counters):
+        """Increment numeric counters without emitting"""
+        with self._lock:
+            for key, value in counters.items():
+                self._state[key] = self._state.get(key, 0) + value
+            self._dirty = True
+
+    def flush(self):
+        """Emit pending progress now"""
+        with self._lock:
+            if self._dirty:
+                self._emit_progress(time.monotonic())
+
+    def event(self, name, **fields):
+        """Emit a one-off event immediately"""
+        self._write({'event': name, 'taskId': self.task_id, **fields})
+
+    def _emit_progress(self, now):
+        state = dict(self._state)
+        stage = state.get('stage')
+        done, total = state.get('done', 0), state.get('total', 0)
+        low, high = STAGE_RANGES.get(stage, (0, 99))
+        ratio = done / total if total else 0
+        state['percent'] = int(low + (high - low) * ratio) if stage != 'done' else 100
+
+        elapsed = now - self._stage_started
+        if done and total and done < total:
+            state['etaSeconds'] = round(elapsed / done * (total - done), 1)
+        else:
+            state['etaSeconds'] = 0
+
+        self._write({'event': 'progress', 'taskId': self.task_id, **state})
+        self._last_emit = now
+        self._dirty = False
+
+    def _write(self, payload):
+        if not self.enabled:
+            return
+        stream = self.stream or sys.stdout
+        stream.write(json.dumps(payload, ensure_ascii=False, separators=(',', ':')) + '\n')
+        stream.flush()
@@ -1,5 +1,5 @@
-from .base_crawler import BaseCrawler
-from .logger import logger
+from ..base_crawler import BaseCrawler
+from ..logger import logger
 
 class GenericForumCrawler(BaseCrawler):
     """Generic forum crawler for extracting posts and images"""
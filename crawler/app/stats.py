@@ -0,0 +1,90 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from app import metrics
+
+# Upper bounds (seconds) of the fetch latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class CrawlStats:
+    """
+    Per-task stage timers and counters
+
+    Stage times are summed over all calls, so stages that run concurrently
+    (page fetches, image downloads) can add up to more than the task's
+    wall time. Safe to share between the threads of one task.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._stages = {}
+        self._counters = {}
+        self._latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._latency_sum = 0.0
+        self._latency_max = 0.0
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block as one call of stage name (wall and thread CPU time)"""
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+    def add_stage(self, name, seconds, cpu_seconds=0.0):
+        metrics.STAGE_SECONDS.labels(name).observe(seconds)
+        with self._lock:
+            stage = self._stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'cpu_seconds': 0.0})
+            stage['calls'] += 1
+            stage['seconds'] += seconds
+            stage['cpu_seconds'] += cpu_seconds
+
+    def count(self, **counters):
+        """Increment named counters"""
+        with self._lock:
+            for key, value in counters.items():
+                self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe_fetch(self, seconds):
+        """Record one page fetch latency (including retries)"""
+        with self._lock:
+            index = 0
+            while index < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[index]:
+                index += 1
+            self._latency_buckets[index] += 1
+            self._latency_sum += seconds
+            self._latency_max = max(self._latency_max, seconds)
+
+    def as_dict(self):
+        """Snapshot as plain data for the task result"""
+        with self._lock:
+            buckets = {}
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), self._latency_buckets):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            fetches = cumulative
+            return {
+                'total_seconds': round(time.monotonic() - self._started, 3),
+                'stages': {
+                    name: {
+                        'calls': stage['calls'],
+                        'seconds': round(stage['seconds'], 3),
+                        'cpu_seconds': round(stage['cpu_seconds'], 3),
+                    }
+                    for name, stage in self._stages.items()
+                },
+                'counters': dict(self._counters),
+                'fetch_latency': {
+                    'count': fetches,
+                    'sum': round(self._latency_sum, 3),
+                    'max': round(self._latency_max, 3),
+                    'mean': round(self._latency_sum / fetches, 3) if fetches else 0,
+                    # Cumulative counts: fetches that took at most <bound> seconds
+                    'buckets': buckets,
+                },
+            }
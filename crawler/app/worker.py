@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+常驻爬虫工作进程
+用法: python3 -m app.worker [--concurrency N]
+
+从 Redis 列表 crawler:jobs 中取出后端派发的任务，在同一个进程内并发执行，
+MongoDB 连接池和 HTTP 连接池在任务之间保持复用。
+任务输出的 NDJSON 进度事件行以及最终的 RESULT:<json> 发布到
+Redis 频道 crawler:events:<taskId>，由后端按原有协议解析。
+后端执行超时时向频道 crawler:cancel:<taskId> 发布消息，对应的任务在下一个页面或图片下载之前停止。
+"""
+
+import sys
+import json
+import signal
+import argparse
+import threading
+
+import redis
+from pymongo import MongoClient
+
+from app.config import (
+    MONGODB_URI,
+    REDIS_HOST,
+    REDIS_PORT,
+    REDIS_PASSWORD,
+    MAX_CONCURRENT_TASKS,
+    PAGE_CONCURRENCY,
+    PER_HOST_LIMIT,
+    BOARD_CONCURRENCY,
+    PARSE_WORKERS,
+    HTTP_CACHE_DIR,
+    HTTP_CACHE_MAX_SIZE,
+    SEEN_INDEX_DIR,
+    SEEN_INDEX_CAPACITY,
+    CHECKPOINT,
+    CHECKPOINT_DIR,
+    CHECKPOINT_MAX_AGE,
+    DOWNLOAD_DELAY,
+    RATE_LIMIT_MIN,
+    RATE_LIMIT_MAX,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+    PROFILE_DIR,
+    NOVEL_CHUNK_CHARS,
+    CONTENT_COMPRESSION,
+    CONTENT_COMPRESSION_LEVEL,
+    CONTENT_COMPRESSION_MIN_CHARS,
+    METRICS_PORT,
+    METRICS_TEXTFILE,
+    METRICS_TEXTFILE_INTERVAL,
+)
+from app import metrics
+from app.http_client import shared_session
+from app.logger import logger
+from app.middlewares.http_cache import HttpCache
+from app.middlewares.rate_limiter import HostRateLimiter
+from app.middlewares.retry import CircuitBreaker
+from app.progress import EVENT_PREFIX
+
+JOB_QUEUE = 'crawler:jobs'
+EVENT_CHANNEL = 'crawler:events:{task_id}'
+CANCEL_CHANNEL = 'crawler:cancel:{task_id}'
+FORWARDED_PREFIXES = (EVENT_PREFIX, 'PROGRESS:', 'CRAWLED:', 'TITLE:', 'ERROR:')
+
+
+class TaskOutputRouter:
+    """
+    stdout wrapper that forwards protocol lines (NDJSON events) printed by a
+    task thread to that task's event channel; all output is still written to
+    the real stream
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+
+    def bind(self, publish):
+        """Forward protocol lines printed by the current thread to publish"""
+        self._local.publish = publish
+        self._local.buffer = ''
+
+    def unbind(self):
+        self._local.publish = None
+
+    def write(self, text):
+        publish = getattr(self._local, 'publish', None)
+        if publish:
+            *lines, self._local.buffer = (self._local.buffer + text).split('\n')
+            for line in lines:
+                if line.startswith(FORWARDED_PREFIXES):
+                    publish(line)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class CrawlerWorker:
+    """Resident worker running crawler jobs with warm connection pools"""
+
+    def __init__(self, redis_client, concurrency=MAX_CONCURRENT_TASKS, mongodb_uri=MONGODB_URI):
+        # Imported here so the worker module stays importable without the crawler scripts
+        from checkpoint import CHECKPOINT_COLLECTION, MongoCheckpointStore, SqliteCheckpointStore
+        from crawl import ForumCrawler
+        from page_parser import ParserPool
+        from seen_index import SeenIndex
+        from text_codec import DICT_COLLECTION, TextCodec
+
+        self.crawler_class = ForumCrawler
+        self.redis = redis_client
+        self.concurrency = max(1, concurrency)
+        self.mongodb_uri = mongodb_uri
+        self.mongo_client = MongoClient(mongodb_uri, serverSelectionTimeoutMS=5000)
+        self.session = shared_session()
+        self.http_cache = HttpCache(HTTP_CACHE_DIR, HTTP_CACHE_MAX_SIZE) if HTTP_CACHE_DIR else None
+        self.seen_index = SeenIndex(SEEN_INDEX_DIR, SEEN_INDEX_CAPACITY) if SEEN_INDEX_DIR else None
+        # Bull retries a failed job with the same task id; its checkpoint lets the retry resume
+        self.checkpoint_store = None
+        if CHECKPOINT == 'file':
+            self.checkpoint_store = SqliteCheckpointStore(CHECKPOINT_DIR, CHECKPOINT_MAX_AGE)
+        elif CHECKPOINT == 'mongo':
+            self.checkpoint_store = MongoCheckpointStore(
+                self.mongo_client['forum-crawler'][CHECKPOINT_COLLECTION], CHECKPOINT_MAX_AGE
+            )
+        # Shared by all jobs so concurrent tasks against one forum respect a single rate
+        self.rate_limiter = HostRateLimiter.from_delay(
+            DOWNLOAD_DELAY * 1000, min_rate=RATE_LIMIT_MIN, max_rate=RATE_LIMIT_MAX
+        )
+        self.circuit_breaker = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+        # Parser processes are started once and shared by all jobs
+        self.parser_pool = ParserPool(workers=PARSE_WORKERS)
+        # Shared so the compression dictionary is loaded once per worker
+        self.text_codec = TextCodec(
+            self.mongo_client['forum-crawler'][DICT_COLLECTION],
+            level=CONTENT_COMPRESSION_LEVEL,
+            min_chars=CONTENT_COMPRESSION_MIN_CHARS,
+            compress=CONTENT_COMPRESSION == 'zstd',
+        )
+        self.output = TaskOutputRouter(sys.stdout)
+        self._stopping = threading.Event()
+        # task id -> cancel Event of the running job
+        self._cancel_events = {}
+        self._cancel_lock = threading.Lock()
+        self._cancel_listener = None
+        metrics.JOB_QUEUE_DEPTH.set_function(lambda: self.redis.llen(JOB_QUEUE))
+
+    def run(self):
+        """Start worker threads and block until stop() is called"""
+        self.mongo_client.admin.command('ping')
+        logger.info(f'Crawler worker started: {self.concurrency} slots, queue {JOB_QUEUE}')
+        sys.stdout = self.output
+        self._listen_for_cancels()
+        threads = [
+            threading.Thread(target=self._loop, name=f'crawler-worker-{i}', daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.stdout = self.output.stream
+            self.close()
+
+    def _listen_for_cancels(self):
+        """Subscribe to cancel messages for all tasks in a background thread"""
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(**{CANCEL_CHANNEL.format(task_id='*'): self._handle_cancel})
+        self._cancel_listener = pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def _handle_cancel(self, message):
+        task_id = message['channel'].split(':', 2)[2]
+        if self.cancel(task_id):
+            logger.warning(f'Cancelling crawler task {task_id}: {message["data"]}')
+
+    def cancel(self, task_id):
+        """Cancel a running job; returns False if no job with this id is running"""
+        with self._cancel_lock:
+            cancel_event = self._cancel_events.get(task_id)
+        if cancel_event is None:
+            return False
+        cancel_event.set()
+        return True
+
+    def stop(self):
+        """Stop taking new jobs; running jobs finish first"""
+        self._stopping.set()
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                item = self.redis.brpop(JOB_QUEUE, timeout=1)
+            except redis.RedisError as e:
+                logger.error(f'Error reading job queue: {str(e)}')
+                self._stopping.wait(1)
+                continue
+            if not item:
+                continue
+            try:
+                job = json.loads(item[1])
+            except ValueError:
+                logger.error(f'Dropping malformed job: {item[1]!r}')
+                continue
+            self.run_job(job)
+
+    def run_job(self, job):
+        """Run one job and publish its progress and result"""
+        task_id = job['taskId']
+        channel = EVENT_CHANNEL.format(task_id=task_id)
+        task_config = job.get('config') or {}
+
+        def publish(line):
+            try:
+                self.redis.publish(channel, line)
+            except redis.RedisError as e:
+                logger.warning(f'Error publishing event for {task_id}: {str(e)}')
+
+        logger.info(f'Starting crawler task {task_id}')
+        cancel_event = threading.Event()
+        with self._cancel_lock:
+            self._cancel_events[task_id] = cancel_event
+        self.output.bind(publish)
+        metrics.TASKS_RUNNING.inc()
+        crawler = None
+        try:
+            crawler = self.crawler_class(
+                task_id,
+                self.mongodb_uri,
+                page_concurrency=PAGE_CONCURRENCY,
+                per_host_limit=PER_HOST_LIMIT,
+                http_cache=self.http_cache,
+                mongo_client=self.mongo_client,
+                session=self.session,
+                parser_pool=self.parser_pool,
+                board_concurrency=BOARD_CONCURRENCY,
+                seen_index=self.seen_index,
+                checkpoint_store=self.checkpoint_store,
+                rate_limiter=self.rate_limiter,
+                circuit_breaker=self.circuit_breaker,
+                profile_dir=PROFILE_DIR if task_config.get('profile') else None,
+                novel_chunk_chars=NOVEL_CHUNK_CHARS,
+                text_codec=self.text_codec,
+                cancel_event=cancel_event,
+            )
+            result = crawler.crawl_forum(
+                job['forumUrl'],
+                job.get('taskType', 'mixed'),
+                task_config.get('maxDepth', 1),
+                incremental=bool(task_config.get('incremental')),
+            )
+        except Exception as e:
+            logger.error(f'Crawler task {task_id} failed: {str(e)}')
+            result = {'success': False, 'task_id': task_id, 'error': str(e)}
+        finally:
+            if crawler:
+                crawler.close()
+            with self._cancel_lock:
+                if self._cancel_events.get(task_id) is cancel_event:
+                    del self._cancel_events[task_id]
+            self.output.unbind()
+            metrics.TASKS_RUNNING.dec()
+        metrics.TASKS_TOTAL.labels(
+            'success' if result['success'] else 'cancelled' if result.get('cancelled') else 'failure'
+        ).inc()
+
+        if not result['success']:
+            publish(f'ERROR:{result.get("error")}')
+        publish('RESULT:' + json.dumps(result, ensure_ascii=False, default=str))
+        logger.info(f'Crawler task {task_id} finished: success={result["success"]}')
+        return result
+
+    def close(self):
+        """Close pooled connections"""
+        if self._cancel_listener is not None:
+            self._cancel_listener.stop()
+        self.session.close()
+        self.parser_pool.close()
+        self.mongo_client.close()
+        if self.http_cache:
+            self.http_cache.close()
+        if self.seen_index:
+            self.seen_index.close()
+        if self.checkpoint_store:
+            self.checkpoint_store.close()
+        if METRICS_TEXTFILE:
+            metrics.write_textfile(METRICS_TEXTFILE)
+
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='Forum Crawler Worker')
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENT_TASKS,
+                        help='同时执行的任务数')
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT,
+                        help='Prometheus 指标 HTTP 端口 (0 为不启用)')
+    return parser.parse_args()
+
+
+def main():
+    """主入口函数"""
+    args = parse_arguments()
+    redis_client = redis.Redis(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        password=REDIS_PASSWORD or None,
+        decode_responses=True,
+    )
+    worker = CrawlerWorker(redis_client, concurrency=args.concurrency)
+    if args.metrics_port:
+        metrics.start_http_server(args.metrics_port)
+        logger.info(f'Serving metrics on :{args.metrics_port}/metrics')
+    if METRICS_TEXTFILE:
+        metrics.start_textfile_writer(METRICS_TEXTFILE, METRICS_TEXTFILE_INTERVAL)
+
+    def handle_signal(signum, frame):
+        logger.warning(f'Signal {signum} received, finishing running tasks')
+        worker.stop()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    worker.run()
+
+
+if __name__ == '__main__':
+    main()
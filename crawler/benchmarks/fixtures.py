@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+基准测试用的 t66y 风格帖子语料
+由固定随机种子生成，每次运行内容完全相同，不依赖网络
+"""
+
+import functools
+import io
+import random
+
+# 语料定义: 页数、每页楼层数、每层文字长度、每层图片数
+CORPORA = {
+    'single': {'pages': 1, 'floors': 20, 'text': 400, 'images': 1},
+    'novel': {'pages': 50, 'floors': 25, 'text': 3000, 'images': 0},
+    'images': {'pages': 5, 'floors': 20, 'text': 40, 'images': 8},
+}
+
+# 图片语料: 数量、尺寸（JPEG 约 200KB），内容重复（不同 URL 相同内容）的比例，
+# 以及近似重复（缩小并重新压缩的同一张图）的比例
+IMAGE_COUNT = 120
+IMAGE_DIMENSIONS = (720, 540)
+IMAGE_QUALITY = 92
+IMAGE_DUPLICATE_RATIO = 0.25
+IMAGE_NEAR_DUPLICATE_RATIO = 0.1
+
+SEED = 20241101
+WORDS = '的 了 在 是 我 有 和 就 不 人 都 一 一个 上 也 很 到 说 要 去 你 会 着 没有 看 好 自己 这'.split()
+
+TID_BASE = {'single': 1000001, 'novel': 1000002, 'images': 1000003}
+
+
+def _text(rng, length):
+    parts = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        parts.append(word)
+        size += len(word)
+    return ''.join(parts)
+
+
+def thread_pages(name, image_host):
+    """
+    生成语料帖子的全部分页
+
+    Args:
+        image_host: 图片服务地址，如 http://127.0.0.1:8000
+
+    Returns:
+        dict: {页码: HTML}，图片地址为 <image_host>/img/<name>/<n>.jpg
+    """
+    spec = CORPORA[name]
+    rng = random.Random(f'{SEED}:{name}')
+    tid = TID_BASE[name]
+    pager = ''.join(
+        f'<a href="read.php?tid={tid}&page={page}">{page}</a>'
+        for page in range(1, spec['pages'] + 1)
+    ) if spec['pages'] > 1 else ''
+
+    pages = {}
+    image_index = 0
+    for page in range(1, spec['pages'] + 1):
+        floors = []
+        for floor in range(spec['floors']):
+            images = []
+            for _ in range(spec['images']):
+                images.append(f'<img ess-data="{image_host}/img/{name}/{image_index % IMAGE_COUNT}.jpg">')
+                image_index += 1
+            # 论坛的表情图片，应被过滤
+            images.append(f'<img src="{image_host}/images/emotion/1.gif">')
+            floors.append(
+                f'<div class="t t2"><div class="tpc_content do_not_catch">'
+                f'{_text(rng, spec["text"])}{"".join(images)}</div></div>'
+            )
+        pages[page] = (
+            f'<html><head><title>基准测试 {name} - t66y.com</title></head><body>'
+            f'<h4 class="f16">基准测试帖子 {name}</h4>'
+            f'<div class="pages">{pager}</div>{"".join(floors)}'
+            f'<div class="pages">{pager}</div></body></html>'
+        )
+    return pages
+
+
+def thread_path(name):
+    """语料帖子第一页的路径"""
+    return f'/read.php?tid={TID_BASE[name]}'
+
+
+@functools.lru_cache(maxsize=None)
+def image_bytes(index):
+    """
+    第 index 张图片的内容（真实的 JPEG，可解码并计算感知哈希）
+    按 IMAGE_DUPLICATE_RATIO 的比例与前面的图片内容相同，用于测量内容去重；
+    按 IMAGE_NEAR_DUPLICATE_RATIO 的比例是前面图片缩小后重新压缩的版本，用于测量近似重复检测。
+    生成的内容会被缓存，只在第一次请求时编码
+    """
+    from PIL import Image
+
+    near = int(IMAGE_COUNT * IMAGE_NEAR_DUPLICATE_RATIO)
+    unique = int(IMAGE_COUNT * (1 - IMAGE_DUPLICATE_RATIO - IMAGE_NEAR_DUPLICATE_RATIO))
+    if index >= unique + near:
+        return image_bytes(index % unique)
+    source = index if index < unique else index - unique
+
+    rng = random.Random(f'{SEED}:img:{source}')
+    width, height = IMAGE_DIMENSIONS
+    # 8x6 的随机色块放大作为画面结构（决定感知哈希），再叠加噪点（决定文件大小）
+    image = Image.frombytes('RGB', (8, 6), rng.randbytes(8 * 6 * 3)).resize((width, height), Image.BICUBIC)
+    noise = Image.frombytes('L', (width, height), rng.randbytes(width * height)).convert('RGB')
+    image = Image.blend(image, noise, 0.3)
+    quality = IMAGE_QUALITY
+    if index >= unique:
+        image = image.resize((width * 2 // 3, height * 2 // 3), Image.LANCZOS)
+        quality = 75
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
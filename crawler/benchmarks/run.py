@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+离线基准测试
+用法: python3 -m benchmarks.run [--output results.json] [--compare baseline.json]
+                                [--only startup,parse,extract,images,mongo] [--rounds N]
+                                [--startup-budget-ms MS]
+
+语料由 benchmarks.fixtures 固定生成，通过本地 HTTP 替身服务提供，不访问外网。
+每项测试在独立的子进程中运行，峰值内存 (peak_rss_mb) 互不影响。
+结果写入 JSON 文件，--compare 与之前提交的结果逐项对比。
+startup 测试发现启动时导入了重型模块，或超出 --startup-budget-ms 时以状态码 1 退出。
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+CRAWLER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if CRAWLER_DIR not in sys.path:
+    sys.path.insert(0, CRAWLER_DIR)
+
+BENCHMARKS = ['startup', 'parse', 'extract', 'images', 'mongo']
+MONGO_BENCH_DB = 'forum-crawler-bench'
+
+# 启动时不应导入的模块：只在写入数据库、解析页面或处理图片时才需要
+STARTUP_HEAVY_MODULES = ['pymongo', 'bson', 'bs4', 'lxml', 'selectolax', 'PIL', 'zstandard', 'multiprocessing']
+STARTUP_IMPORT_PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import crawl
+seconds = time.perf_counter() - started
+print(json.dumps({'seconds': seconds, 'modules': [m for m in %r if m in sys.modules]}))
+''' % (STARTUP_HEAVY_MODULES,)
+
+
+def _peak_rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _crawler(backend, mongodb_uri, parse_workers=0):
+    """不连接数据库、不限速、不输出进度事件的爬虫实例"""
+    from pymongo import MongoClient
+    from crawl import ForumCrawler
+    from app.middlewares.rate_limiter import HostRateLimiter
+    from app.progress import ProgressReporter
+
+    crawler = ForumCrawler(
+        'bench',
+        mongodb_uri,
+        html_parser=backend,
+        parse_workers=parse_workers,
+        mongo_client=MongoClient(mongodb_uri, connect=False),
+        rate_limiter=HostRateLimiter(initial_rate=1e6, max_rate=1e6),
+    )
+    crawler.progress = ProgressReporter('bench', enabled=False)
+    return crawler
+
+
+def _quiet():
+    """屏蔽被测代码的逐页/逐图输出"""
+    sys.stdout = open(os.devnull, 'w')
+
+
+def bench_startup(options):
+    """
+    冷启动：新进程中 import crawl 的耗时和导入的重型模块，
+    以及从启动 crawl.py 进程到第一个页面请求到达的时间（数据库地址不可达，连接在后台进行）
+    """
+    from benchmarks.server import FixtureServer
+
+    import_timings = []
+    for _ in range(options['rounds']):
+        output = subprocess.run(
+            [sys.executable, '-c', STARTUP_IMPORT_PROBE],
+            cwd=CRAWLER_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+        probe = json.loads(output.strip().splitlines()[-1])
+        import_timings.append(probe['seconds'])
+
+    env = dict(os.environ, MONGODB_URI='mongodb://127.0.0.1:9/forum-crawler')
+    first_request_timings = []
+    with FixtureServer() as server:
+        for _ in range(options['rounds']):
+            server.request_times.clear()
+            started = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, 'crawl.py', '--url', server.thread_url('single'), '--type', 'novel',
+                 '--task-id', '0' * 24],
+                cwd=CRAWLER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                while not server.request_times and process.poll() is None:
+                    time.sleep(0.001)
+                if not server.request_times:
+                    raise RuntimeError(f'crawl.py 未发出页面请求即退出 (状态码 {process.returncode})')
+                first_request_timings.append(server.request_times[0] - started)
+            finally:
+                process.kill()
+                process.wait()
+
+    return {
+        'import_ms': round(statistics.median(import_timings) * 1000, 1),
+        'first_request_ms': round(statistics.median(first_request_timings) * 1000, 1),
+        'heavy_modules': probe['modules'],
+        'heavy_module_count': len(probe['modules']),
+    }
+
+
+def _startup_failures(result, budget_ms):
+    """startup 测试结果中超出启动预算的项"""
+    failures = []
+    if result.get('heavy_modules'):
+        failures.append(f"启动时导入了重型模块: {', '.join(result['heavy_modules'])}")
+    if budget_ms and result.get('first_request_ms', 0) > budget_ms:
+        failures.append(f"第一个页面请求在 {result['first_request_ms']} ms 后发出，超出预算 {budget_ms} ms")
+    return failures
+
+
+def bench_parse(options):
+    """
+    parse_t66y_post 端到端（经本地 HTTP 获取全部分页并解析）
+    --parse-workers 不为 0 时另外测试解析进程池（结果名带 /workers<N> 后缀）
+    """
+    from benchmarks import fixtures
+    from benchmarks.server import FixtureServer
+    from page_parser import available_backends
+
+    results = {}
+    variants = [0] + ([options['parse_workers']] if options['parse_workers'] else [])
+    with FixtureServer() as server:
+        for backend, parse_workers in ((b, w) for b in available_backends() for w in variants):
+            crawler = _crawler(backend, options['mongodb_uri'], parse_workers)
+            suffix = f'/workers{parse_workers}' if parse_workers else ''
+            for name in fixtures.CORPORA:
+                url = server.thread_url(name)
+                pages = len(server.pages(name))
+                timings = []
+                # 第一轮为预热（导入、连接建立），不计入结果
+                for _ in range(options['rounds'] + 1):
+                    started = time.perf_counter()
+                    html = crawler.fetch_page(url)
+                    post = crawler.parse_t66y_post(url, html, 'mixed')
+                    timings.append(time.perf_counter() - started)
+                    assert post and post['crawl_state']['pagesSeen'] == list(range(1, pages + 1))
+                seconds = statistics.median(timings[1:])
+                results[f'{backend}/{name}{suffix}'] = {
+                    'pages': pages,
+                    'seconds': round(seconds, 4),
+                    'pages_per_s': round(pages / seconds, 1),
+                    'ms_per_page': round(seconds / pages * 1000, 3),
+                }
+            crawler.close()
+    return results
+
+
+def bench_extract(options):
+    """_extract_page_content 纯解析（HTML 已在内存中），含图片 URL 去重"""
+    from benchmarks import fixtures
+    from page_parser import available_backends
+
+    image_host = 'http://127.0.0.1'
+    corpora = {name: list(fixtures.thread_pages(name, image_host).values()) for name in fixtures.CORPORA}
+    results = {}
+    for backend in available_backends():
+        crawler = _crawler(backend, options['mongodb_uri'])
+        for name, pages in corpora.items():
+            timings = []
+            for _ in range(options['rounds'] + 1):
+                content_parts, images = [], []
+                started = time.perf_counter()
+                for page_num, html in enumerate(pages, 1):
+                    crawler._extract_page_content(html, content_parts, images, page_num)
+                timings.append(time.perf_counter() - started)
+            seconds = statistics.median(timings[1:])
+            image_refs = sum(html.count('ess-data=') for html in pages)
+            results[f'{backend}/{name}'] = {
+                'pages': len(pages),
+                'bytes': sum(len(html.encode('utf-8')) for html in pages),
+                'image_refs': image_refs,
+                'unique_images': len(images),
+                'pages_per_s': round(len(pages) / seconds, 1),
+                'ms_per_page': round(seconds / len(pages) * 1000, 3),
+            }
+        crawler.close()
+    return results
+
+
+def bench_images(options):
+    """
+    download_images 冷下载吞吐量（含近似重复检测的感知哈希），
+    以及内容寻址存储命中（同一 URL 再次下载）的开销
+    """
+    import image_downloader
+    from image_fingerprint import FingerprintIndex
+    from image_store import ImageStore
+    from benchmarks import fixtures
+    from benchmarks.server import FixtureServer
+    from app.progress import ProgressReporter
+
+    work_dir = tempfile.mkdtemp(prefix='bench-images-')
+    image_downloader.IMAGES_UPLOAD_DIR = os.path.join(work_dir, 'uploads')
+    image_downloader.image_store = ImageStore(os.path.join(work_dir, '.store'))
+    # 感知哈希索引同样放在临时目录，不读写真实的索引
+    image_downloader.fingerprints = FingerprintIndex(
+        os.path.join(work_dir, '.store'), image_downloader.NEAR_DUPLICATE_DISTANCE
+    )
+    image_downloader.initialize_image_dirs()
+    # 图片在计时之前编码好，替身服务只负责发送
+    for index in range(fixtures.IMAGE_COUNT):
+        fixtures.image_bytes(index)
+    progress = ProgressReporter('bench', enabled=False)
+    results = {}
+    try:
+        with FixtureServer() as server:
+            urls = server.image_urls()
+            started = time.perf_counter()
+            cold = image_downloader.download_images(urls, 'cold', progress=progress)
+            seconds = time.perf_counter() - started
+            downloaded = sum(result.get('bytes', 0) for result in cold)
+            blobs = [
+                os.path.join(root, file_name)
+                for root, _, files in os.walk(os.path.join(work_dir, '.store', 'blobs'))
+                for file_name in files
+            ]
+            results['cold'] = {
+                'images': len(urls),
+                'succeeded': sum(result['success'] for result in cold),
+                'seconds': round(seconds, 4),
+                'mb_per_s': round(downloaded / seconds / 1024 / 1024, 1),
+                'images_per_s': round(len(urls) / seconds, 1),
+                'downloaded_bytes': downloaded,
+                'near_duplicates': sum(1 for result in cold if result.get('near_duplicate_of')),
+                'unique_blobs': len(blobs),
+                'stored_bytes': sum(os.path.getsize(path) for path in blobs),
+            }
+
+            started = time.perf_counter()
+            warm = image_downloader.download_images(urls, 'warm', progress=progress)
+            seconds = time.perf_counter() - started
+            results['store_hit'] = {
+                'images': len(urls),
+                'succeeded': sum(result['success'] for result in warm),
+                'network_bytes': sum(result.get('bytes', 0) for result in warm),
+                'ms_per_image': round(seconds / len(urls) * 1000, 3),
+            }
+        results['duplicate_ratio'] = fixtures.IMAGE_DUPLICATE_RATIO
+        results['near_duplicate_ratio'] = fixtures.IMAGE_NEAR_DUPLICATE_RATIO
+        results['near_duplicate_mode'] = image_downloader.NEAR_DUPLICATE_MODE
+    finally:
+        image_downloader.image_store.close()
+        image_downloader.fingerprints.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def bench_mongo(options):
+    """帖子 upsert 速率：逐条 update_one（crawl.py）与批量 bulk_write（MongoDBPipeline）"""
+    from bson import ObjectId
+    from pymongo import MongoClient, UpdateOne
+    from pymongo.errors import PyMongoError
+
+    count = options['mongo_docs']
+    client = MongoClient(options['mongodb_uri'], serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command('ping')
+    except PyMongoError as e:
+        return {'skipped': f'MongoDB 不可用: {e.__class__.__name__}'}
+
+    collection = client[MONGO_BENCH_DB]['posts']
+    results = {}
+    try:
+        client.drop_database(MONGO_BENCH_DB)
+        collection.create_index('sourceUrl', unique=True)
+
+        def doc(i):
+            return {
+                'title': f'基准测试帖子 {i}',
+                'content': 'x' * 2000,
+                'postType': 'text',
+                'tags': ['mixed', 't66y'],
+                'media': [{'url': f'/img/{i}.jpg', 'originalUrl': f'http://127.0.0.1/img/{i}.jpg'}],
+                'taskId': ObjectId(),
+            }
+
+        started = time.perf_counter()
+        for i in range(count):
+            collection.update_one(
+                {'sourceUrl': f'http://127.0.0.1/read.php?tid={i}'},
+                {'$set': doc(i), '$setOnInsert': {'createdAt': datetime.now(timezone.utc)}},
+                upsert=True,
+            )
+        seconds = time.perf_counter() - started
+        results['update_one'] = {'docs': count, 'docs_per_s': round(count / seconds, 1)}
+
+        batch_size = 500
+        started = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            collection.bulk_write([
+                UpdateOne(
+                    {'sourceUrl': f'http://127.0.0.1/read.php?tid={i}'},
+                    {'$set': doc(i), '$setOnInsert': {'_id': ObjectId()}},
+                    upsert=True,
+                )
+                for i in range(count + offset, count + min(offset + batch_size, count))
+            ], ordered=False)
+        seconds = time.perf_counter() - started
+        results['bulk_write'] = {
+            'docs': count,
+            'batch_size': batch_size,
+            'docs_per_s': round(count / seconds, 1),
+        }
+    finally:
+        client.drop_database(MONGO_BENCH_DB)
+        client.close()
+    return results
+
+
+BENCH_FUNCTIONS = {
+    'startup': bench_startup,
+    'parse': bench_parse,
+    'extract': bench_extract,
+    'images': bench_images,
+    'mongo': bench_mongo,
+}
+
+
+def _run_isolated(name, options):
+    """在子进程中执行（由 spawn 进程池调用）"""
+    _quiet()
+    result = BENCH_FUNCTIONS[name](options)
+    result['peak_rss_mb'] = _peak_rss_mb()
+    return result
+
+
+def _metadata():
+    from page_parser import available_backends
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=CRAWLER_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'html_backends': available_backends(),
+    }
+
+
+def _flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        path = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(baseline, current):
+    """逐项打印与基线结果的差异"""
+    old = _flatten(baseline.get('results', {}))
+    new = _flatten(current.get('results', {}))
+    print(f"对比基线 {baseline.get('meta', {}).get('commit')} → {current['meta'].get('commit')}")
+    for path in sorted(set(old) & set(new)):
+        before, after = old[path], new[path]
+        change = f'{(after - before) / before * 100:+.1f}%' if before else 'n/a'
+        print(f'  {path:<48} {before:>12} → {after:<12} {change}')
+
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='Crawler offline benchmarks')
+    parser.add_argument('--output', default='benchmark-results.json', help='结果文件 (JSON)')
+    parser.add_argument('--compare', default=None, help='与之前的结果文件对比')
+    parser.add_argument('--only', default=','.join(BENCHMARKS),
+                        help=f'要运行的测试，逗号分隔 ({",".join(BENCHMARKS)})')
+    parser.add_argument('--rounds', type=int, default=3, help='每项重复次数，取中位数')
+    parser.add_argument('--startup-budget-ms', type=float, default=0,
+                        help='startup 测试中从启动到第一个页面请求的时间上限 (0 为不检查)')
+    parser.add_argument('--parse-workers', type=int, default=max(2, (os.cpu_count() or 1) // 2),
+                        help='parse 测试中解析进程池的进程数 (0 为只测试线程内解析)')
+    parser.add_argument('--mongo-docs', type=int, default=2000, help='Mongo upsert 测试的文档数')
+    parser.add_argument('--mongodb-uri',
+                        default=os.environ.get('BENCH_MONGODB_URI', 'mongodb://localhost:27017'),
+                        help='本地 mongod 地址 (不可用时跳过 mongo 测试)')
+    return parser.parse_args()
+
+
+def main():
+    """主入口"""
+    args = parse_arguments()
+    names = [name.strip() for name in args.only.split(',') if name.strip()]
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        print(f"✗ 未知的测试: {', '.join(sorted(unknown))}", file=sys.stderr)
+        sys.exit(2)
+
+    options = {
+        'rounds': max(1, args.rounds),
+        'parse_workers': max(0, args.parse_workers),
+        'mongo_docs': args.mongo_docs,
+        'mongodb_uri': args.mongodb_uri,
+    }
+    report = {'meta': _metadata(), 'options': options, 'results': {}}
+    context = multiprocessing.get_context('spawn')
+    for name in names:
+        print(f"▶ {name} ...", flush=True)
+        # 非 daemon 子进程，parse 测试可在其中启动解析进程池
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(_run_isolated, name, options).result()
+        report['results'][name] = result
+        print(json.dumps(result, ensure_ascii=False, indent=2), flush=True)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✓ 结果已写入 {args.output}", flush=True)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), report)
+
+    failures = _startup_failures(report['results'].get('startup', {}), args.startup_budget_ms)
+    for failure in failures:
+        print(f"✗ {failure}", file=sys.stderr, flush=True)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
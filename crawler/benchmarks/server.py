@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+本地 HTTP 替身服务
+提供语料帖子的分页（read.php?tid=&page=）和图片（/img/<name>/<n>.jpg）
+"""
+
+import http.server
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks import fixtures
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.request_times.append(time.perf_counter())
+        parsed = urlparse(self.path)
+        if parsed.path.startswith('/img/'):
+            index = int(parsed.path.rsplit('/', 1)[-1].split('.')[0])
+            self._send(fixtures.image_bytes(index), 'image/jpeg')
+            return
+        if parsed.path == '/read.php':
+            query = parse_qs(parsed.query)
+            thread = self.server.threads.get(query.get('tid', [''])[0])
+            page = query.get('page', ['1'])[0]
+            html = thread.get(int(page)) if thread and page.isdigit() else None
+            if html:
+                self._send(html.encode('utf-8'), 'text/html; charset=utf-8')
+                return
+        self._send(b'not found', 'text/plain', status=404)
+
+    def _send(self, body, content_type, status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 被测进程可能在请求中途被结束 (startup 测试)
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FixtureServer:
+    """在后台线程中运行的语料服务，监听 127.0.0.1 的随机端口"""
+
+    def __init__(self):
+        self.httpd = _Server(('127.0.0.1', 0), _Handler)
+        # 每个请求到达的时间 (time.perf_counter)
+        self.httpd.request_times = []
+        self.base_url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        self.httpd.threads = {
+            str(fixtures.TID_BASE[name]): fixtures.thread_pages(name, self.base_url)
+            for name in fixtures.CORPORA
+        }
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def thread_url(self, name):
+        return self.base_url + fixtures.thread_path(name)
+
+    def image_urls(self, name='bench'):
+        return [f'{self.base_url}/img/{name}/{i}.jpg' for i in range(fixtures.IMAGE_COUNT)]
+
+    def pages(self, name):
+        return self.httpd.threads[str(fixtures.TID_BASE[name])]
+
+    @property
+    def request_times(self):
+        return self.httpd.request_times
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+任务检查点
+爬取过程中逐条记录已完成的页面（解析后的楼层）、已完成的图片下载和看板中已保存的帖子。
+任务失败后重试（Bull attempts）或被执行超时中断后重新运行时，同一个任务 ID 的检查点
+仍然存在：已记录的页面直接从检查点还原，不再获取和解析；已下载的图片直接复用结果；
+看板中已保存的帖子直接跳过。任务成功后清除检查点。
+
+检查点保存在本地 SQLite (SqliteCheckpointStore) 或 MongoDB (MongoCheckpointStore) 中，
+后者可在不同机器上的重试之间共享。
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import types
+from datetime import datetime, timezone
+
+from page_parser import ParsedPage
+
+CHECKPOINT_COLLECTION = 'crawl_checkpoints'
+# 超过该时间未完成的检查点视为废弃，自动清除
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS journal (
+    task_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (task_id, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS journal_created_at ON journal (created_at);
+'''
+
+
+class SqliteCheckpointStore:
+    """
+    本地检查点存储，多个任务（和多个爬虫进程）共享同一个数据库
+
+    存储:
+        <checkpoint_dir>/checkpoints.sqlite3
+    """
+
+    def __init__(self, checkpoint_dir, max_age=DEFAULT_MAX_AGE):
+        self.checkpoint_dir = checkpoint_dir
+        self.db_path = os.path.join(checkpoint_dir, 'checkpoints.sqlite3')
+        self._lock = threading.Lock()
+
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+        # 清除废弃的检查点
+        self._db.execute('DELETE FROM journal WHERE created_at < ?', (time.time() - max_age,))
+        self._db.commit()
+
+    def open(self, task_id):
+        return TaskCheckpoint(self, task_id)
+
+    def keys(self, task_id):
+        with self._lock:
+            return {key for (key,) in self._db.execute('SELECT key FROM journal WHERE task_id = ?', (task_id,))}
+
+    def get(self, task_id, key):
+        with self._lock:
+            row = self._db.execute(
+                'SELECT value FROM journal WHERE task_id = ? AND key = ?', (task_id, key)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, task_id, key, value):
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO journal (task_id, key, value, created_at) VALUES (?, ?, ?, ?)',
+                (task_id, key, json.dumps(value, ensure_ascii=False), time.time())
+            )
+            self._db.commit()
+
+    def clear(self, task_id):
+        with self._lock:
+            self._db.execute('DELETE FROM journal WHERE task_id = ?', (task_id,))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class MongoCheckpointStore:
+    """
+    MongoDB 检查点存储，每条记录一个文档，废弃的检查点由 TTL 索引清除
+
+    checkpoint 文档:
+        { taskId, key, value, createdAt }
+    """
+
+    def __init__(self, collection, max_age=DEFAULT_MAX_AGE):
+        """
+        Args:
+            collection: crawl_checkpoints 集合，或返回该集合的函数（第一次使用时调用，
+                        用于数据库在后台连接的情况）
+            max_age: 检查点的保留时间（秒）
+        """
+        self._collection = collection
+        self.max_age = max_age
+        self._indexed = False
+        self._lock = threading.Lock()
+
+    @property
+    def collection(self):
+        with self._lock:
+            # Collection 对象本身也是 callable，只把普通函数视为延迟获取
+            if isinstance(self._collection, types.FunctionType):
+                self._collection = self._collection()
+            if not self._indexed:
+                self._collection.create_index([('taskId', 1), ('key', 1)], unique=True)
+                self._collection.create_index('createdAt', expireAfterSeconds=int(self.max_age))
+                self._indexed = True
+            return self._collection
+
+    def open(self, task_id):
+        return TaskCheckpoint(self, task_id)
+
+    def keys(self, task_id):
+        return {doc['key'] for doc in self.collection.find({'taskId': task_id}, {'key': 1, '_id': 0})}
+
+    def get(self, task_id, key):
+        doc = self.collection.find_one({'taskId': task_id, 'key': key}, {'value': 1})
+        return doc['value'] if doc else None
+
+    def put(self, task_id, key, value):
+        self.collection.update_one(
+            {'taskId': task_id, 'key': key},
+            {'$set': {'value': value, 'createdAt': datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+    def clear(self, task_id):
+        self.collection.delete_many({'taskId': task_id})
+
+    def close(self):
+        pass
+
+
+class TaskCheckpoint:
+    """
+    单个任务的检查点
+
+    记录的键:
+        page:<页码>:<帖子URL>    解析后的页面 (ParsedPage.to_dict)
+        download:<图片URL>       成功的下载结果 (download_image 的返回值)
+        thread:<帖子URL>         看板中已保存的帖子
+    已有记录的键在第一次使用时一次性读入，之后只查询存在的记录。
+    写入失败只输出警告，不影响爬取；release() 之后不再写入
+    """
+
+    def __init__(self, store, task_id):
+        self.store = store
+        self.task_id = task_id
+        self._keys = None
+        self._released = False
+        self._lock = threading.Lock()
+
+    def _known(self):
+        with self._lock:
+            if self._keys is None:
+                try:
+                    self._keys = self.store.keys(self.task_id)
+                except Exception as e:
+                    print(f"⚠ 读取检查点失败: {e}", file=sys.stderr, flush=True)
+                    self._keys = set()
+            return self._keys
+
+    def _get(self, key):
+        if key not in self._known():
+            return None
+        try:
+            return self.store.get(self.task_id, key)
+        except Exception as e:
+            print(f"⚠ 读取检查点失败 {key}: {e}", file=sys.stderr, flush=True)
+            return None
+
+    def _put(self, key, value):
+        known = self._known()
+        if key in known or self._released:
+            return
+        try:
+            self.store.put(self.task_id, key, value)
+        except Exception as e:
+            print(f"⚠ 写入检查点失败 {key}: {e}", file=sys.stderr, flush=True)
+            return
+        with self._lock:
+            known.add(key)
+
+    def summary(self):
+        """已有记录按类型计数，如 {'page': 12, 'download': 30}"""
+        counts = {}
+        for key in self._known():
+            kind = key.split(':', 1)[0]
+            counts[kind] = counts.get(kind, 0) + 1
+        return counts
+
+    def page(self, url, page_num):
+        """已记录的页面 (ParsedPage)，没有时返回 None"""
+        data = self._get(f'page:{page_num}:{url}')
+        return ParsedPage.from_dict(data) if data else None
+
+    def record_page(self, url, page_num, page):
+        self._put(f'page:{page_num}:{url}', page.to_dict())
+
+    def download(self, url):
+        """已记录的下载结果，没有时返回 None"""
+        return self._get(f'download:{url}')
+
+    def record_download(self, url, result):
+        if result.get('success'):
+            self._put(f'download:{url}', result)
+
+    def thread_done(self, url):
+        return f'thread:{url}' in self._known()
+
+    def mark_thread_done(self, url):
+        self._put(f'thread:{url}', True)
+
+    def release(self):
+        """任务被取消时调用：已有记录保留给重试，之后（如仍在进行的下载）不再写入"""
+        self._released = True
+
+    def clear(self):
+        """任务成功后清除检查点"""
+        try:
+            self.store.clear(self.task_id)
+        except Exception as e:
+            print(f"⚠ 清除检查点失败: {e}", file=sys.stderr, flush=True)
+        with self._lock:
+            self._keys = set()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+长帖正文的分块存储
+楼层内容边提取边写入，累计超过块大小后写入 post_chunks 集合，帖子文档只保存分块索引，
+内存占用与帖子长度无关；内容不足一块的帖子仍直接保存在 content 字段中
+"""
+
+import time
+
+from app import metrics
+
+CHUNK_COLLECTION = 'post_chunks'
+# 分块保存的帖子在 content 字段中保留的预览长度（字符）
+PREVIEW_CHARS = 2000
+FLOOR_SEPARATOR = '\n\n'
+
+
+def ensure_indexes(collection):
+    """按 (generation, seq) 顺序读取分块；按 sourceUrl 清理旧版本"""
+    collection.create_index([('generation', 1), ('seq', 1)], unique=True)
+    collection.create_index('sourceUrl')
+
+
+class ChunkWriter:
+    """
+    按顺序接收楼层文本的分块写入器
+
+    可直接替代 _extract_page_content 使用的 content_parts 列表 (append / len)。
+    每次完整爬取使用新的 generation，新版本的分块全部写入并更新帖子索引后再删除旧版本，
+    读取方不会看到新旧混合的内容；增量爬取沿用帖子已有的 generation 继续追加。
+    按 seq 顺序读取各块并以 FLOOR_SEPARATOR 连接即为完整正文。
+
+    chunk 文档:
+        { sourceUrl, generation, seq, firstPage, lastPage, floors, chars, text }
+    传入 codec 时 text 按 TextCodec.pack 的字段约定压缩保存 (textZstd / textDictId / textChars)
+    """
+
+    def __init__(self, collection, source_url, chunk_chars, index=None, head=None, stats=None, codec=None):
+        """
+        Args:
+            collection: post_chunks 集合
+            source_url: 帖子 URL
+            chunk_chars: 块大小（字符），缓冲的内容超过后写出一块
+            index: 帖子已有的 contentChunks 索引，传入时追加到该版本之后
+            head: 首次写出分块前调用，返回帖子已有的内联正文（写成第一块），可为 None
+            stats: CrawlStats，写入耗时计入 db 阶段
+            codec: TextCodec，为 None 时不压缩
+        """
+        from bson import ObjectId
+        self.collection = collection
+        self.source_url = source_url
+        self.chunk_chars = max(1, chunk_chars)
+        self.head = head
+        self.stats = stats
+        self.codec = codec
+        # 已写出分块后为 True，之后所有内容都分块保存
+        self.spilled = index is not None
+        self.generation = index['generation'] if index else ObjectId()
+        self.seq = index['count'] if index else 0
+        self.chars = index['chars'] if index else 0
+        self.floors = 0
+        self.new_chars = 0
+        self.preview = ''
+        self._parts = []
+        self._buffered = 0
+        self._pages = None
+        self._page = 1
+
+    def set_page(self, page_num):
+        """之后追加的楼层所在的页码"""
+        self._page = page_num
+
+    def append(self, text):
+        self._parts.append(text)
+        self._buffered += len(text) + len(FLOOR_SEPARATOR)
+        self.floors += 1
+        self.new_chars += len(text)
+        if self._pages is None:
+            self._pages = [self._page, self._page]
+        self._pages[1] = self._page
+        if self._buffered >= self.chunk_chars:
+            self._spill()
+
+    def __len__(self):
+        return self.floors
+
+    def _spill(self):
+        if not self.spilled:
+            self.spilled = True
+            existing = self.head() if self.head else None
+            if existing:
+                self._write(existing, self._pages[0], self._pages[0], 0)
+        text = FLOOR_SEPARATOR.join(self._parts)
+        self._write(text, self._pages[0], self._pages[1], len(self._parts))
+        self._parts = []
+        self._buffered = 0
+        self._pages = None
+
+    def _write(self, text, first_page, last_page, floors):
+        if not self.preview and self.seq == 0:
+            self.preview = text[:PREVIEW_CHARS]
+        chunk = {
+            'sourceUrl': self.source_url,
+            'generation': self.generation,
+            'seq': self.seq,
+            'firstPage': first_page,
+            'lastPage': last_page,
+            'floors': floors,
+            'chars': len(text),
+        }
+        chunk.update(self.codec.pack(text, 'text')[0] if self.codec else {'text': text})
+        started = time.perf_counter()
+        self.collection.replace_one({'generation': self.generation, 'seq': self.seq}, chunk, upsert=True)
+        elapsed = time.perf_counter() - started
+        metrics.MONGO_WRITE_SECONDS.labels(CHUNK_COLLECTION, 'replace_one').observe(elapsed)
+        if self.stats:
+            self.stats.add_stage('db', elapsed)
+        self.chars += len(text)
+        self.seq += 1
+
+    def finish(self):
+        """
+        写出剩余内容
+
+        Returns:
+            tuple: (content, index)
+                未分块时 content 为完整正文、index 为 None；
+                分块时 content 为新内容（首块）的预览，index 为帖子的 contentChunks 索引
+        """
+        if not self.spilled:
+            content = FLOOR_SEPARATOR.join(self._parts)
+            self._parts = []
+            return content, None
+        if self._parts:
+            self._spill()
+        return self.preview, {
+            'generation': self.generation,
+            'count': self.seq,
+            'chars': self.chars,
+        }
+
+    def discard_other_generations(self):
+        """删除该帖子其他版本的分块（未分块时删除全部分块）"""
+        current = self.generation if self.spilled else None
+        self.collection.delete_many({'sourceUrl': self.source_url, 'generation': {'$ne': current}})
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+看板爬取的待爬队列
+从论坛列表页中识别帖子链接和列表分页链接，按深度限制、去重并按优先级出队
+"""
+
+import heapq
+import itertools
+import re
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+# 帖子链接: read.php?tid=123 或 htm_data/2511/20/123.html
+THREAD_PATTERNS = [
+    re.compile(r'read\.php\?(?:[^#]*&)?tid=(\d+)'),
+    re.compile(r'htm_data/\d+/\d+/(\d+)\.html'),
+]
+# 看板列表页: thread0806.php?fid=7&page=2
+BOARD_PATTERN = re.compile(r'thread\w*\.php\?(?:[^#]*&)?fid=(\d+)')
+BOARD_PAGE_PATTERN = re.compile(r'[?&]page=(\d+)')
+
+# 出队优先级：先处理已发现的帖子，再展开新的列表页，避免待爬队列无限增长
+KIND_PRIORITY = {'thread': 0, 'board': 1}
+
+
+def classify_link(url):
+    """
+    识别链接类型
+
+    Returns:
+        tuple: (类型 'thread' / 'board', 去重键)，其他链接返回 (None, None)
+    """
+    for pattern in THREAD_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            return 'thread', f'tid:{match.group(1)}'
+    match = BOARD_PATTERN.search(url)
+    if match:
+        page = BOARD_PAGE_PATTERN.search(url)
+        return 'board', f'fid:{match.group(1)}:{page.group(1) if page else 1}'
+    return None, None
+
+
+def canonical_key(url):
+    """
+    URL 的规范化去重键
+
+    帖子的 read.php?tid= 和 htm_data/.../tid.html 两种形式映射为同一个键 tid:<tid>，
+    看板列表页映射为 fid:<fid>:<page>；其他 URL 去掉片段、统一大小写并排序查询参数
+    """
+    kind, key = classify_link(url)
+    if kind:
+        return key
+    parts = urlsplit(url.strip())
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', query, ''))
+
+
+def is_board_url(url):
+    """是否为看板列表页 URL"""
+    return classify_link(url)[0] == 'board'
+
+
+class Frontier:
+    """
+    按深度限制、去重的优先级待爬队列
+
+    出队顺序: 帖子优先于列表页，同类按深度从浅到深，同深度按发现顺序。
+    列表页中链接的深度为列表页深度 + 1，深度达到 max_depth 的列表页不再加入
+    （其中的帖子会超出深度限制）
+
+    传入 seen（如 SeenIndex）时，之前运行中已爬取过的帖子不再加入
+    """
+
+    def __init__(self, max_depth, seen=None):
+        self.max_depth = max_depth
+        self.seen = seen
+        self.skipped = 0
+        self._heap = []
+        self._seen = set()
+        self._counter = itertools.count()
+
+    def push(self, url, depth, base_url=None):
+        """
+        加入链接（相对链接基于 base_url 补全）
+
+        Returns:
+            str: 加入的链接类型；超出深度、重复或无法识别时返回 None
+        """
+        if base_url:
+            url = urljoin(base_url, url)
+        kind, key = classify_link(url)
+        if kind is None or key in self._seen:
+            return None
+        if depth > self.max_depth or (kind == 'board' and depth >= self.max_depth):
+            return None
+        self._seen.add(key)
+        if kind == 'thread' and self.seen is not None and url in self.seen:
+            self.skipped += 1
+            return None
+        heapq.heappush(self._heap, (KIND_PRIORITY[kind], depth, next(self._counter), url, kind))
+        return kind
+
+    def pop(self):
+        """
+        Returns:
+            tuple: (url, depth, kind)
+        """
+        _, depth, _, url, kind = heapq.heappop(self._heap)
+        return url, depth, kind
+
+    def peek_kind(self):
+        """下一个出队链接的类型，队列为空时返回 None"""
+        return self._heap[0][4] if self._heap else None
+
+    def __len__(self):
+        return len(self._heap)
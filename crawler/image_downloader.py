@@ -4,14 +4,36 @@
 在爬虫执行时下载图片并保存到本地
 """
 
+import functools
 import os
-import requests
+import threading
 import hashlib
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from urllib.parse import urlparse
 import logging
 
+from app.middlewares.host_limiter import HostLimiter
+from app import metrics
+from app.http_client import IMAGE_HEADERS, shared_session
+from app.middlewares.retry import CircuitBreaker, CircuitOpenError, IncompleteDownloadError, RetryPolicy
+from app.progress import ProgressReporter
+from image_fingerprint import FingerprintIndex, dhash
+from image_store import ImageStore
+
 logger = logging.getLogger(__name__)
 
+# 并发下载设置
+DOWNLOAD_WORKERS = int(os.environ.get('IMAGE_DOWNLOAD_WORKERS', 8))  # 下载线程数
+PER_HOST_LIMIT = int(os.environ.get('IMAGE_PER_HOST_LIMIT', 4))  # 单个图床的最大并发数
+
+MAX_IMAGE_SIZE = int(os.environ.get('IMAGE_MAX_SIZE', 50 * 1024 * 1024))  # 单张图片上限 50MB
+CHUNK_SIZE = 64 * 1024  # 流式写入的分块大小
+PROGRESS_POLL_INTERVAL = 1.0  # 等待下载完成时合并进度的最长间隔（秒）
+
+# 近似重复图片（缩放、重新压缩后的同一张图）: off 不检测, mark 标记, skip 复用已有图片且不在同一帖子中重复保存
+NEAR_DUPLICATE_MODE = os.environ.get('IMAGE_NEAR_DUPLICATES', 'mark')
+NEAR_DUPLICATE_DISTANCE = int(os.environ.get('IMAGE_NEAR_DUPLICATE_DISTANCE', 4))  # dHash 汉明距离上限
+
 # 定义图片存储目录
 # 支持两种运行环境：Docker 容器和本地开发
 if os.path.exists('/app/public'):
@@ -23,10 +45,18 @@ else:
     IMAGES_BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../public/images')
     IMAGES_UPLOAD_DIR = os.path.join(IMAGES_BASE_DIR, 'uploads')
 
+# 内容寻址存储，与 uploads 位于同一卷以便硬链接
+# 以 . 开头的目录不会被 Express 静态服务暴露
+IMAGES_STORE_DIR = os.path.join(IMAGES_BASE_DIR, '.store')
+image_store = ImageStore(IMAGES_STORE_DIR)
+fingerprints = FingerprintIndex(IMAGES_STORE_DIR, NEAR_DUPLICATE_DISTANCE)
+
+
 def initialize_image_dirs():
     """初始化图片目录"""
     try:
         os.makedirs(IMAGES_UPLOAD_DIR, exist_ok=True)
+        image_store.initialize()
         print(f"✓ 图片目录已初始化: {IMAGES_UPLOAD_DIR}", flush=True)
     except Exception as e:
         print(f"✗ 初始化图片目录失败: {e}", flush=True)
@@ -57,16 +87,21 @@ def generate_file_name(url, extension=None):
     
     return f"{file_hash}.{extension}"
 
-def download_image(url, task_id):
+def download_image(url, task_id, rate_limiter=None, retry_policy=None):
     """
     下载单张图片
     
     Args:
         url: 图片URL
         task_id: 任务ID
+        rate_limiter: HostRateLimiter，传入时按图床的自适应速率发送请求
+        retry_policy: RetryPolicy，传入时重试可恢复的错误，图床熔断时直接失败
     
     Returns:
-        dict: { 'success': bool, 'local_path': str, 'error': str }
+        dict: { 'success': bool, 'local_path': str, 'bytes': int, 'digest': str,
+                'near_duplicate_of': str, 'error': str }
+              bytes 为本次从网络下载的字节数（复用已有文件时为 0）；
+              near_duplicate_of 为近似重复的已有图片的 digest（IMAGE_NEAR_DUPLICATES 不为 off 时）
     """
     if not url or not url.startswith('http'):
         return {'success': False, 'error': '无效的URL'}
@@ -82,88 +117,327 @@ def download_image(url, task_id):
         
         file_path = os.path.join(task_image_dir, file_name)
         
-        # 如果文件已经存在，直接返回
-        if os.path.exists(file_path):
-            local_path = f'/public/images/uploads/{task_id}/{file_name}'
+        local_path = f'/public/images/uploads/{task_id}/{file_name}'
+        
+        # 如果文件已经存在，直接返回（空文件视为损坏，重新下载）
+        if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
             return {'success': True, 'local_path': local_path}
         
-        # 下载图片
-        response = requests.get(
-            url,
-            timeout=10,
-            headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                # 'Referer': 'https://t66y.com/',  # 移除 Referer 以避免防盗链
-                'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
-                'Accept-Language': 'zh-CN,zh;q=0.9',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Cache-Control': 'no-cache',
-                'Pragma': 'no-cache'
-            },
-            verify=False  # 忽略 SSL 证书验证
+        # URL 已在任意任务中下载过：直接引用已有 blob，跳过网络请求
+        cached = image_store.lookup_url(url)
+        if cached:
+            try:
+                image_store.link(cached[0], cached[1], task_id, file_path)
+                return {'success': True, 'local_path': local_path, 'digest': cached[0]}
+            except FileNotFoundError:
+                pass  # blob 刚被其他任务释放，重新下载
+        
+        # 流式下载图片（复用与页面请求共享的连接池，不发送 Referer 以避免防盗链）
+        send = functools.partial(
+            metrics.track_request, 'image', url,
+            lambda: shared_session().get(url, headers=IMAGE_HEADERS, stream=True)
         )
+        if rate_limiter:
+            send = functools.partial(rate_limiter.request, url, send)
+        streamed = None
+        
+        def fetch():
+            """请求并读取完整内容；内容被截断时抛出可重试的错误，由 retry_policy 重新下载"""
+            nonlocal streamed
+            with send() as response:
+                if not response.ok:
+                    return response
+                # 先根据 Content-Length 检查文件大小
+                declared_length = response.headers.get('Content-Length')
+                if declared_length and declared_length.isdigit() and int(declared_length) > MAX_IMAGE_SIZE:
+                    streamed = (int(declared_length), None, None, '文件过大')
+                    return response
+                streamed = _stream_to_temp(response)
+                metrics.RESPONSE_BYTES.labels('image').inc(streamed[0])
+                _check_complete(response, *streamed)
+                return response
+        
+        response = retry_policy.call(url, fetch) if retry_policy else fetch()
         response.raise_for_status()
+        content_length, digest, temp_path, error = streamed
         
-        # 检查文件大小（限制为 50MB）
-        content_length = len(response.content)
-        if content_length > 50 * 1024 * 1024:
-            return {'success': False, 'error': '文件过大'}
+        if error:
+            if content_length == 0:
+                print(f"⚠ 下载图片内容为空: {url}", flush=True)
+            return {'success': False, 'error': error}
         
-        if content_length == 0:
-            print(f"⚠ 下载图片内容为空: {url}", flush=True)
-            return {'success': False, 'error': '图片内容为空'}
-
-        # 保存文件
-        with open(file_path, 'wb') as f:
-            f.write(response.content)
+        # 新内容先查找近似重复的已有图片（相同内容已有 blob 时无需比较）
+        near = fingerprint = None
+        if NEAR_DUPLICATE_MODE != 'off' and image_store.lookup_digest(digest) is None:
+            near, fingerprint = _find_near_duplicate(temp_path, digest)
+        if near and NEAR_DUPLICATE_MODE == 'skip':
+            os.remove(temp_path)
+            image_store.add_url(url, near[0])
+            image_store.link(near[0], near[1], task_id, file_path)
+            print(f"✓ 近似重复图片，复用已有图片 ({content_length} bytes): {url}", flush=True)
+            return {'success': True, 'local_path': local_path, 'bytes': content_length,
+                    'digest': near[0], 'near_duplicate_of': near[0]}
+        
+        # 相同内容只保存一份，任务目录中创建指向 blob 的硬链接
+        blob_path = image_store.add_blob(temp_path, digest, extension, content_length, url)
+        image_store.link(digest, blob_path, task_id, file_path)
+        if fingerprint is not None and near is None:
+            # blob 保存之后才加入感知哈希索引：索引中的图片都能找到 blob
+            fingerprints.add(digest, fingerprint)
         
         print(f"✓ 下载成功 ({content_length} bytes): {url}", flush=True)
-        local_path = f'/public/images/uploads/{task_id}/{file_name}'
-        return {'success': True, 'local_path': local_path}
+        result = {'success': True, 'local_path': local_path, 'bytes': content_length, 'digest': digest}
+        if near:
+            result['near_duplicate_of'] = near[0]
+        return result
     
     except Exception as e:
+        if isinstance(e, CircuitOpenError):
+            metrics.REQUEST_ERRORS.labels('image', 'circuit_open').inc()
         return {'success': False, 'error': str(e)}
 
-def download_images(image_urls, task_id):
+def _find_near_duplicate(temp_path, digest):
+    """
+    查找与新下载图片近似重复的已有图片
+    
+    Returns:
+        tuple: (近似图片, 新图片的 dHash)
+               近似图片为 (已有图片的 digest, blob 路径)，没有时为 None；
+               dHash 为 None 时新图片不加入索引（无法解码或缺少细节）
+    """
+    try:
+        value = dhash(temp_path)
+    except Exception:
+        return None, None  # 无法解码的文件不参与比较
+    # 纯色等缺少细节的图片哈希为全 0 或全 1，彼此都会误判为近似
+    if value in (0, (1 << 64) - 1):
+        return None, None
+    while True:
+        match = fingerprints.match(value, exclude=digest)
+        if match is None:
+            return None, value
+        blob_path = image_store.lookup_digest(match[0])
+        if blob_path:
+            return (match[0], blob_path), value
+        # 图片在 blob 保存之后才加入索引，找不到 blob 说明已被释放
+        fingerprints.remove(match[0])
+
+def _stream_to_temp(response):
     """
-    批量下载图片
+    分块写入存储目录中的临时文件，同时计算内容的 SHA-256
+    超过 MAX_IMAGE_SIZE 时立即停止，失败时删除临时文件，不会留下残缺文件
+    
+    Returns:
+        tuple: (已写入字节数, SHA-256, 临时文件路径, 错误信息或 None)
+    """
+    fd, temp_path = image_store.temp_file()
+    content_length = 0
+    sha256 = hashlib.sha256()
+    error = None
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                content_length += len(chunk)
+                if content_length > MAX_IMAGE_SIZE:
+                    error = '文件过大'
+                    break
+                sha256.update(chunk)
+                f.write(chunk)
+        
+        if not error and content_length == 0:
+            error = '图片内容为空'
+    except Exception:
+        os.remove(temp_path)
+        raise
+    
+    if error:
+        os.remove(temp_path)
+        return content_length, None, None, error
+    return content_length, sha256.hexdigest(), temp_path, None
+
+def _check_complete(response, content_length, digest, temp_path, error):
+    """
+    检查读取的字节数是否与 Content-Length 一致（内容经过压缩传输时无法比较，不检查）
+    不一致时删除临时文件并抛出 IncompleteDownloadError
+    """
+    declared_length = response.headers.get('Content-Length')
+    if error or not declared_length or not declared_length.isdigit():
+        return
+    if response.headers.get('Content-Encoding', 'identity').lower() != 'identity':
+        return
+    if content_length != int(declared_length):
+        os.remove(temp_path)
+        raise IncompleteDownloadError(f'图片内容不完整: {content_length}/{declared_length} bytes')
+
+def _download_limited(url, task_id, host_limiter, rate_limiter, retry_policy):
+    """在图床并发上限内下载单张图片"""
+    with host_limiter.slot(url):
+        return download_image(url, task_id, rate_limiter, retry_policy)
+
+class DownloadQueue:
+    """
+    边发现边下载的图片队列
+    
+    解析页面时逐张 submit，下载立即在线程池中开始，与后续页面的获取和解析重叠；
+    未完成的下载达到 max_pending 时 submit 阻塞，页面处理随之暂停（背压），
+    排队的图片数量不会超过下载速度所能消化的范围。
+    下载进度在调用 results() 之后才按 images 阶段上报，之前只累计下载字节数。
+    完成回调在下载线程中执行，只更新计数；进度事件由调用 results() 的线程输出
+    （常驻工作进程按线程把输出转发到任务的事件频道）
+    """
+    
+    def __init__(self, task_id, max_workers=None, per_host_limit=None, progress=None,
+                 rate_limiter=None, retry_policy=None, max_pending=None, checkpoint=None, cancel_event=None):
+        """
+        Args:
+            task_id: 任务ID
+            max_workers: 下载线程数，默认 DOWNLOAD_WORKERS
+            per_host_limit: 单个图床的最大并发数，默认 PER_HOST_LIMIT
+            progress: ProgressReporter，默认新建一个输出到 stdout 的进度报告器
+            rate_limiter: HostRateLimiter，与页面请求共享的每主机自适应限速，默认不限速
+            retry_policy: RetryPolicy，默认新建一个（带熔断器，无总重试次数限制）
+            max_pending: 最多同时排队和下载的图片数，默认为下载线程数的 4 倍
+            checkpoint: TaskCheckpoint，记录成功的下载；之前的尝试已下载且文件仍在的图片直接复用结果
+            cancel_event: threading.Event，被设置后 results() 取消尚未开始的下载，只等待进行中的下载
+        """
+        self.task_id = task_id
+        self.host_limiter = HostLimiter(per_host_limit or PER_HOST_LIMIT)
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy(breaker=CircuitBreaker())
+        self.progress = progress or ProgressReporter(task_id)
+        self.checkpoint = checkpoint
+        self.cancel_event = cancel_event
+        workers = max(1, max_workers or DOWNLOAD_WORKERS)
+        self.urls = []
+        self._futures = []
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._slots = threading.Semaphore(max_pending or workers * 4)
+        self._lock = threading.Lock()
+        self._done = 0
+        self._failed = 0
+        self._queue_depth = metrics.QUEUE_DEPTH.labels('image_downloads')
+    
+    def __len__(self):
+        return len(self._futures)
+    
+    def submit(self, url):
+        """提交一张图片；排队的图片已满时阻塞到有下载完成"""
+        resumed = self._resumed(url)
+        if resumed is not None:
+            future = Future()
+            future.set_result(resumed)
+            self.urls.append(url)
+            self._futures.append(future)
+            with self._lock:
+                self._done += 1
+            return
+        self._slots.acquire()
+        self._queue_depth.inc()
+        self.urls.append(url)
+        future = self._pool.submit(
+            _download_limited, url, self.task_id, self.host_limiter, self.rate_limiter, self.retry_policy
+        )
+        self._futures.append(future)
+        future.add_done_callback(functools.partial(self._finished, url))
+    
+    def _resumed(self, url):
+        """检查点中记录的下载结果（文件仍在任务目录中时），否则返回 None"""
+        result = self.checkpoint.download(url) if self.checkpoint else None
+        if not result:
+            return None
+        file_path = os.path.join(IMAGES_UPLOAD_DIR, self.task_id, os.path.basename(result['local_path']))
+        if not os.path.exists(file_path):
+            return None
+        return dict(result, bytes=0, resumed=True)
+    
+    @staticmethod
+    def _result(future):
+        if future.cancelled():
+            return {'success': False, 'error': '下载已取消'}
+        try:
+            return future.result()
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def _finished(self, url, future):
+        self._slots.release()
+        self._queue_depth.dec()
+        result = self._result(future)
+        if self.checkpoint is not None and result['success']:
+            self.checkpoint.record_download(url, result)
+        with self._lock:
+            self._done += 1
+            if not result['success']:
+                self._failed += 1
+        # 只累计，不输出事件
+        self.progress.add(bytesDownloaded=result.get('bytes', 0))
+    
+    def results(self):
+        """
+        等待全部下载完成
+        
+        Returns:
+            list: 下载结果列表，顺序与提交顺序 (urls) 一致
+        """
+        with self._lock:
+            done, failed = self._done, self._failed
+        if self._futures:
+            self.progress.update(stage='images', done=done, total=len(self._futures), failed=failed)
+        pending = self._futures
+        while pending:
+            # 每完成一张（或每隔 PROGRESS_POLL_INTERVAL 秒）合并一次进度，按时间间隔限流输出
+            _, pending = wait(pending, timeout=PROGRESS_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            with self._lock:
+                done, failed = self._done, self._failed
+            self.progress.update(done=done, failed=failed)
+        self.close()
+        self.progress.flush()
+        return [self._result(future) for future in self._futures]
+    
+    def close(self, cancel=False):
+        """关闭下载线程池；cancel 为 True 时取消尚未开始的下载"""
+        self._pool.shutdown(wait=True, cancel_futures=cancel)
+
+def download_images(image_urls, task_id, max_workers=None, per_host_limit=None, progress=None,
+                    rate_limiter=None, retry_policy=None):
+    """
+    批量并发下载图片
     
     Args:
         image_urls: 图片URL列表
         task_id: 任务ID
+        其余参数同 DownloadQueue
     
     Returns:
-        list: 下载结果列表
+        list: 下载结果列表，顺序与 image_urls 一致
     """
     if not isinstance(image_urls, list) or len(image_urls) == 0:
         return []
     
-    results = []
-    batch_size = 5  # 并发下载数
-    
-    for i in range(0, len(image_urls), batch_size):
-        batch = image_urls[i:i+batch_size]
-        
-        for url in batch:
-            result = download_image(url, task_id)
-            results.append(result)
-        
-        # 打印进度 (同时输出百分比格式供 Node.js 解析)
-        progress = min(i + batch_size, len(image_urls))
-        progress_percent = int((progress / len(image_urls)) * 100)
-        print(f"[图片下载] 进度: {progress}/{len(image_urls)}", flush=True)
-        print(f"PROGRESS:{progress_percent}", flush=True)
-    
-    return results
+    queue = DownloadQueue(
+        task_id, min(max_workers or DOWNLOAD_WORKERS, len(image_urls)), per_host_limit, progress,
+        rate_limiter, retry_policy, max_pending=len(image_urls)
+    )
+    try:
+        for url in image_urls:
+            queue.submit(url)
+        return queue.results()
+    finally:
+        queue.close(cancel=True)
 
 def delete_task_images(task_id):
-    """删除任务的所有图片"""
+    """删除任务的所有图片，仅释放不再被其他任务引用的 blob"""
     try:
         task_image_dir = os.path.join(IMAGES_UPLOAD_DIR, task_id)
         if os.path.exists(task_image_dir):
             import shutil
             shutil.rmtree(task_image_dir)
             print(f"✓ 已删除任务图片: {task_id}", flush=True)
+        freed = image_store.release_task(task_id)
+        if freed:
+            print(f"✓ 已释放未被引用的图片: {freed} 张", flush=True)
     except Exception as e:
         print(f"✗ 删除任务图片失败: {e}", flush=True)
 
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+图片感知哈希与近似重复检测
+同一张图片以不同分辨率或重新压缩后转发时，内容哈希不同但 dHash 只相差几位，
+按汉明距离查找即可识别。
+
+索引使用多索引哈希 (multi-index hashing)：64 位哈希切成 threshold + 1 段，
+汉明距离不超过 threshold 的两个哈希至少有一段完全相同（抽屉原理），
+因此只需按各段精确查询候选，再计算完整距离，无需把全部哈希载入内存。
+"""
+
+import os
+import sqlite3
+import threading
+
+HASH_BITS = 64
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS fingerprints (
+    digest TEXT PRIMARY KEY,
+    hash INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (band, value, digest)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS bands_digest ON bands (digest);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+'''
+
+
+def dhash(path):
+    """
+    计算图片的 64 位差值哈希 (dHash)
+    缩小为 9x8 灰度图，比较每行相邻像素的明暗。JPEG 按 draft 模式低分辨率解码
+    """
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image.draft('L', (64, 64))
+        small = image.convert('L').resize((9, 8), Image.LANCZOS)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+def _split_bands(value, count):
+    """把哈希切成 count 段（位数尽量均匀），返回各段的值"""
+    bands = []
+    start = 0
+    for index in range(count):
+        width = HASH_BITS // count + (1 if index < HASH_BITS % count else 0)
+        bands.append((value >> start) & ((1 << width) - 1))
+        start += width
+    return bands
+
+
+def _to_signed(value):
+    """SQLite INTEGER 为有符号 64 位"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class FingerprintIndex:
+    """
+    持久化的图片感知哈希索引，按汉明距离查找近似重复
+
+    存储:
+        <index_dir>/fingerprints.sqlite3
+    """
+
+    def __init__(self, index_dir, threshold=4):
+        self.index_dir = index_dir
+        self.index_path = os.path.join(index_dir, 'fingerprints.sqlite3')
+        self.threshold = max(0, min(threshold, 15))
+        self.band_count = self.threshold + 1
+        self._local = threading.local()
+        # 同一进程内的查找和写入串行执行
+        self._lock = threading.Lock()
+        self._checked = False
+
+    def _conn(self):
+        """每个线程使用独立的 SQLite 连接（多个爬虫进程共享同一个索引）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(self.index_dir, exist_ok=True)
+            conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        if not self._checked:
+            self._check_bands(conn)
+            self._checked = True
+        return conn
+
+    def _check_bands(self, conn):
+        """阈值改变导致分段数不同时，按新的分段重建 bands 表"""
+        row = conn.execute("SELECT value FROM meta WHERE key = 'bands'").fetchone()
+        if row and row[0] == self.band_count:
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM bands')
+            rows = conn.execute('SELECT digest, hash FROM fingerprints').fetchall()
+            conn.executemany(
+                'INSERT INTO bands (band, value, digest) VALUES (?, ?, ?)',
+                (
+                    (band, value, digest)
+                    for digest, signed in rows
+                    for band, value in enumerate(_split_bands(signed & (2 ** 64 - 1), self.band_count))
+                ),
+            )
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('bands', ?)", (self.band_count,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _nearest(self, conn, value, exclude):
+        best = None
+        for band, band_value in enumerate(_split_bands(value, self.band_count)):
+            for digest, signed in conn.execute(
+                'SELECT f.digest, f.hash FROM bands b JOIN fingerprints f ON f.digest = b.digest '
+                'WHERE b.band = ? AND b.value = ?',
+                (band, band_value)
+            ):
+                if digest == exclude:
+                    continue
+                distance = ((signed & (2 ** 64 - 1)) ^ value).bit_count()
+                if distance <= self.threshold and (best is None or distance < best[1]):
+                    best = (digest, distance)
+        return best
+
+    def match(self, value, exclude=None):
+        """
+        查找与 value 汉明距离不超过阈值的已有图片（不包括 exclude）
+
+        Returns:
+            tuple: (近似图片的 digest, 距离)，没有近似图片时返回 None
+        """
+        with self._lock:
+            return self._nearest(self._conn(), value, exclude)
+
+    def add(self, digest, value):
+        """把已保存的图片加入索引"""
+        with self._lock:
+            conn = self._conn()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._insert(conn, digest, value)
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+    def _insert(self, conn, digest, value):
+        conn.execute(
+            'INSERT OR REPLACE INTO fingerprints (digest, hash) VALUES (?, ?)',
+            (digest, _to_signed(value))
+        )
+        conn.execute('DELETE FROM bands WHERE digest = ?', (digest,))
+        conn.executemany(
+            'INSERT INTO bands (band, value, digest) VALUES (?, ?, ?)',
+            ((band, band_value, digest) for band, band_value in enumerate(_split_bands(value, self.band_count)))
+        )
+
+    def remove(self, digest):
+        """删除已不存在的图片的哈希"""
+        with self._lock:
+            conn = self._conn()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute('DELETE FROM fingerprints WHERE digest = ?', (digest,))
+                conn.execute('DELETE FROM bands WHERE digest = ?', (digest,))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+    def close(self):
+        """关闭当前线程的索引连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
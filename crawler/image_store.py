@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+内容寻址的图片存储
+图片按内容的 SHA-256 只保存一份 (blob)，任务目录中的文件是指向 blob 的硬链接
+SQLite 索引记录 URL→blob 的映射和每个任务的引用，跨任务共享
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    ext TEXT NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    digest TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS urls_digest ON urls (digest);
+CREATE TABLE IF NOT EXISTS refs (
+    task_id TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (task_id, file_name)
+);
+CREATE INDEX IF NOT EXISTS refs_digest ON refs (digest);
+'''
+
+
+class ImageStore:
+    """
+    内容寻址的图片存储
+
+    目录结构:
+        <store_dir>/blobs/<digest[:2]>/<digest>.<ext>
+        <store_dir>/index.sqlite3
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.blob_dir = os.path.join(store_dir, 'blobs')
+        self.index_path = os.path.join(store_dir, 'index.sqlite3')
+        self._local = threading.local()
+
+    def initialize(self):
+        """创建存储目录和索引表"""
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._conn()
+
+    def _conn(self):
+        """每个线程使用独立的 SQLite 连接（多个爬虫进程共享同一个索引）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(self.store_dir, exist_ok=True)
+            conn = sqlite3.connect(self.index_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def blob_path(self, digest, ext):
+        """blob 文件路径"""
+        return os.path.join(self.blob_dir, digest[:2], f'{digest}.{ext}')
+
+    def temp_file(self):
+        """
+        在存储目录中创建临时文件（与 blob 位于同一文件系统，便于原子重命名）
+
+        Returns:
+            tuple: (文件描述符, 临时文件路径)
+        """
+        os.makedirs(self.blob_dir, exist_ok=True)
+        return tempfile.mkstemp(dir=self.blob_dir, prefix='.', suffix='.part')
+
+    def lookup_url(self, url):
+        """
+        查找 URL 对应的 blob
+
+        Returns:
+            tuple: (digest, blob 路径)，未下载过或 blob 已被删除时返回 None
+        """
+        row = self._conn().execute(
+            'SELECT blobs.digest, blobs.ext FROM urls JOIN blobs ON urls.digest = blobs.digest '
+            'WHERE urls.url = ?',
+            (url,)
+        ).fetchone()
+        if not row:
+            return None
+        path = self.blob_path(*row)
+        return (row[0], path) if os.path.exists(path) else None
+
+    def lookup_digest(self, digest):
+        """
+        查找内容哈希对应的 blob
+
+        Returns:
+            str: blob 路径，不存在时返回 None
+        """
+        row = self._conn().execute('SELECT ext FROM blobs WHERE digest = ?', (digest,)).fetchone()
+        if not row:
+            return None
+        path = self.blob_path(digest, row[0])
+        return path if os.path.exists(path) else None
+
+    def add_url(self, url, digest):
+        """记录 URL 对应已有的 blob（下载内容未单独保存时）"""
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO urls (url, digest) VALUES (?, ?)',
+                (url, digest)
+            )
+
+    def add_blob(self, temp_path, digest, ext, size, url):
+        """
+        将下载完成的临时文件存为 blob，并记录 URL 索引
+        相同内容的 blob 已存在时丢弃临时文件
+
+        Returns:
+            str: blob 路径
+        """
+        conn = self._conn()
+        with conn:
+            # 并发下载相同内容时只有一个能写入 blob 记录，其余沿用已记录的扩展名
+            conn.execute(
+                'INSERT OR IGNORE INTO blobs (digest, ext, size) VALUES (?, ?, ?)',
+                (digest, ext, size)
+            )
+            ext = conn.execute('SELECT ext FROM blobs WHERE digest = ?', (digest,)).fetchone()[0]
+            conn.execute(
+                'INSERT OR REPLACE INTO urls (url, digest) VALUES (?, ?)',
+                (url, digest)
+            )
+
+        path = self.blob_path(digest, ext)
+        if os.path.exists(path):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+        return path
+
+    def link(self, digest, blob_path, task_id, target_path):
+        """
+        让任务文件引用 blob（优先硬链接，跨文件系统时复制）并记录引用
+        """
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO refs (task_id, file_name, digest) VALUES (?, ?, ?)',
+                (task_id, os.path.basename(target_path), digest)
+            )
+        if os.path.exists(target_path):
+            return
+        temp_target = f'{target_path}.{threading.get_ident()}.link'
+        try:
+            os.link(blob_path, temp_target)
+        except OSError:
+            shutil.copyfile(blob_path, temp_target)
+        os.replace(temp_target, target_path)
+
+    def release_task(self, task_id):
+        """
+        删除任务的所有引用，并删除不再被任何任务引用的 blob
+
+        Returns:
+            int: 释放的 blob 数量
+        """
+        conn = self._conn()
+        with conn:
+            digests = [row[0] for row in conn.execute(
+                'SELECT DISTINCT digest FROM refs WHERE task_id = ?', (task_id,)
+            )]
+            conn.execute('DELETE FROM refs WHERE task_id = ?', (task_id,))
+            orphans = []
+            for digest in digests:
+                referenced = conn.execute(
+                    'SELECT 1 FROM refs WHERE digest = ? LIMIT 1', (digest,)
+                ).fetchone()
+                if referenced:
+                    continue
+                row = conn.execute('SELECT ext FROM blobs WHERE digest = ?', (digest,)).fetchone()
+                conn.execute('DELETE FROM urls WHERE digest = ?', (digest,))
+                conn.execute('DELETE FROM blobs WHERE digest = ?', (digest,))
+                if row:
+                    orphans.append(self.blob_path(digest, row[0]))
+
+        for path in orphans:
+            if os.path.exists(path):
+                os.remove(path)
+        return len(orphans)
+
+    def close(self):
+        """关闭当前线程的索引连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
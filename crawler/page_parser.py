@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+页面解析工具
+每个页面只解析一次，标题、楼层、图片和分页提取共享同一个解析结果
+支持多种解析后端: selectolax / lxml / html.parser
+"""
+
+import importlib.util
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+PAGE_NUMBER_PATTERN = re.compile(r'page=(\d+)')
+
+# 标题候选选择器，按优先级排列
+TITLE_SELECTORS = ['h4.f16', 'h1.bbs-head-title', 'h1', 'title']
+
+# 按速度从快到慢排列的解析后端
+PARSER_BACKENDS = ['selectolax', 'lxml', 'html.parser']
+
+
+def _backend_installed(backend):
+    """检查解析后端依赖是否已安装（只查找模块，不导入）"""
+    try:
+        if backend == 'selectolax':
+            return importlib.util.find_spec('selectolax.lexbor') is not None
+        if backend == 'lxml':
+            return importlib.util.find_spec('lxml') is not None
+        return True
+    except ImportError:
+        return False
+
+
+def preload_backend(backend=None):
+    """
+    导入解析后端的依赖
+    解析器在第一次解析时才导入；启动时可在后台线程中调用，与第一个页面的获取同时进行
+    """
+    backend = backend or default_backend()
+    if backend == 'selectolax':
+        import selectolax.lexbor  # noqa: F401
+    else:
+        import bs4  # noqa: F401
+
+
+def available_backends():
+    """返回当前环境可用的解析后端"""
+    return [backend for backend in PARSER_BACKENDS if _backend_installed(backend)]
+
+
+def default_backend():
+    """
+    选择解析后端
+    优先使用环境变量 CRAWLER_HTML_PARSER，否则选择可用的最快后端
+    """
+    backend = os.environ.get('CRAWLER_HTML_PARSER', '').strip()
+    if backend:
+        if backend not in PARSER_BACKENDS:
+            raise ValueError(f'未知的解析后端: {backend}')
+        return backend
+    return available_backends()[0]
+
+
+def _img_url(attrs):
+    """t66y 论坛使用 ess-data 属性存储实际图片 URL"""
+    return attrs.get('ess-data') or attrs.get('src') or attrs.get('data-src')
+
+
+class _SoupTree:
+    """BeautifulSoup 解析树 (html.parser / lxml)"""
+
+    def __init__(self, html, parser):
+        from bs4 import BeautifulSoup
+        self.soup = BeautifulSoup(html, parser)
+
+    def first_text(self, selector):
+        tag, _, class_name = selector.partition('.')
+        if class_name:
+            elem = self.soup.find(tag, class_=class_name)
+        else:
+            elem = self.soup.find(tag)
+        return elem.get_text(strip=True) if elem else None
+
+    def floors(self):
+        divs = self.soup.find_all('div', class_='tpc_content')
+        fallback = False
+        if not divs:
+            div = self.soup.find('div', id='conttpc')
+            divs = [div] if div else []
+            fallback = True
+        floors = [
+            (div.get_text(strip=True), [_img_url(img) for img in div.find_all('img')])
+            for div in divs
+        ]
+        return floors, fallback
+
+    def hrefs(self):
+        return [link.get('href', '') for link in self.soup.find_all('a')]
+
+
+class _SelectolaxTree:
+    """selectolax 解析树 (基于 C 实现的 Lexbor 引擎)"""
+
+    def __init__(self, html):
+        from selectolax.lexbor import LexborHTMLParser
+        self.tree = LexborHTMLParser(html)
+        # BeautifulSoup 的 get_text 不包含 script / style 的内容，这里先移除，保证各后端文本一致
+        self.tree.strip_tags(['script', 'style'])
+
+    def first_text(self, selector):
+        elem = self.tree.css_first(selector)
+        return elem.text(strip=True) if elem else None
+
+    def floors(self):
+        divs = self.tree.css('div.tpc_content')
+        fallback = False
+        if not divs:
+            div = self.tree.css_first('div#conttpc')
+            divs = [div] if div else []
+            fallback = True
+        floors = [
+            (div.text(strip=True), [_img_url(img.attributes) for img in div.css('img')])
+            for div in divs
+        ]
+        return floors, fallback
+
+    def hrefs(self):
+        return [link.attributes.get('href') or '' for link in self.tree.css('a')]
+
+
+class ParsedPage:
+    """
+    单次解析后的页面
+
+    Attributes:
+        title: 原始标题文本（未清理），未找到时为 None
+        floors: [(楼层文本, [图片URL, ...]), ...]，按页面顺序排列
+        fallback: 未找到 tpc_content 楼层、使用 #conttpc 备用选择器时为 True
+        page_numbers: 分页链接中出现的所有页码
+        links: 页面中所有链接的 href（原始值，未补全），按页面顺序排列
+    """
+
+    def __init__(self, html, backend=None):
+        self.backend = backend or default_backend()
+        if self.backend == 'selectolax':
+            tree = _SelectolaxTree(html)
+        else:
+            tree = _SoupTree(html, self.backend)
+
+        self.title = None
+        for selector in TITLE_SELECTORS:
+            self.title = tree.first_text(selector)
+            if self.title is not None:
+                break
+
+        self.floors, self.fallback = tree.floors()
+
+        self.links = tree.hrefs()
+        self.page_numbers = set()
+        for href in self.links:
+            match = PAGE_NUMBER_PATTERN.search(href)
+            if match:
+                self.page_numbers.add(int(match.group(1)))
+
+    @property
+    def max_page(self):
+        """分页导航中的最大页码，无分页时为 1"""
+        return max(self.page_numbers) if self.page_numbers else 1
+
+    def to_dict(self):
+        """可 JSON 序列化的帖子页内容（不含 links，用于检查点）"""
+        return {
+            'title': self.title,
+            'floors': [[text, list(images)] for text, images in self.floors],
+            'fallback': self.fallback,
+            'pageNumbers': sorted(self.page_numbers),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """由 to_dict 的结果还原页面，无需重新解析 HTML"""
+        page = cls.__new__(cls)
+        page.backend = None
+        page.title = data['title']
+        page.floors = [(text, list(images)) for text, images in data['floors']]
+        page.fallback = data['fallback']
+        page.page_numbers = set(data['pageNumbers'])
+        page.links = []
+        return page
+
+
+def parse_page(html, backend=None):
+    """解析页面 HTML，返回 ParsedPage"""
+    return ParsedPage(html, backend)
+
+
+def parse_page_bytes(content, backend=None, encoding='utf-8'):
+    """
+    解码并解析原始 HTML 字节（在解析进程中执行）
+
+    Returns:
+        tuple: (ParsedPage, 耗时, CPU 时间)，时间为秒
+    """
+    started, cpu = time.perf_counter(), time.process_time()
+    page = ParsedPage(content.decode(encoding, errors='replace'), backend)
+    return page, time.perf_counter() - started, time.process_time() - cpu
+
+
+class ParserPool:
+    """
+    页面解析进程池
+
+    BeautifulSoup / lxml 解析是 CPU 密集操作且持有 GIL，在线程中并发解析只能用到一个核心；
+    放到进程池后多个页面可同时解析。页面以原始字节传入，解码也在子进程中完成，
+    返回的 ParsedPage 只包含普通数据，可直接传回。
+    进程池在首次提交时创建（spawn，可在多线程进程中安全启动），可在多个任务间共享；
+    workers 为 0 时在调用线程中解析
+    """
+
+    def __init__(self, backend=None, workers=0):
+        self.backend = backend or default_backend()
+        self.workers = max(0, workers)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def submit(self, content, encoding='utf-8'):
+        """提交解析，返回 Future，结果同 parse_page_bytes"""
+        if self.workers == 0:
+            future = Future()
+            try:
+                future.set_result(parse_page_bytes(content, self.backend, encoding))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        return self._executor().submit(parse_page_bytes, content, self.backend, encoding)
+
+    def _executor(self):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+            return self._pool
+
+    def close(self):
+        """关闭进程池"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+持久化的已爬取 URL 索引
+内存中的 Bloom 过滤器在前，磁盘上的 SQLite 精确集合在后：
+未命中 Bloom 过滤器的 URL 直接判定为未爬取，命中时再查询 SQLite 排除误判
+"""
+
+import hashlib
+import math
+import os
+import sqlite3
+import struct
+import threading
+import time
+
+from frontier import canonical_key
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS seen (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    seen_at REAL NOT NULL
+) WITHOUT ROWID;
+'''
+
+# Bloom 文件头: 位数, 哈希函数个数, 写入时 SQLite 中的键数
+BLOOM_HEADER = struct.Struct('<QQQ')
+
+
+class BloomFilter:
+    """
+    固定大小的 Bloom 过滤器
+
+    按预期容量和误判率确定位数和哈希函数个数，
+    k 个位置由一次 BLAKE2b 摘要拆成的两个 64 位哈希组合得到 (double hashing)
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class SeenIndex:
+    """
+    已爬取 URL 的持久化集合
+
+    URL 先经过 canonical_key 规范化（帖子的两种 URL 形式视为同一个帖子）。
+    Bloom 过滤器在 close() 时写入磁盘，下次启动时加载；
+    文件缺失、参数变化或与 SQLite 中的键数不一致（上次未正常关闭）时从 SQLite 重建。
+
+    目录结构:
+        <index_dir>/seen.sqlite3
+        <index_dir>/seen.bloom
+    """
+
+    def __init__(self, index_dir, capacity=1000000, error_rate=0.001):
+        self.index_dir = index_dir
+        self.db_path = os.path.join(index_dir, 'seen.sqlite3')
+        self.bloom_path = os.path.join(index_dir, 'seen.bloom')
+        self._lock = threading.Lock()
+
+        os.makedirs(index_dir, exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(SCHEMA)
+        self.count = self._db.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+        self.bloom = BloomFilter(max(capacity, self.count), error_rate)
+        if not self._load_bloom():
+            self._rebuild_bloom()
+
+    def _load_bloom(self):
+        """加载磁盘上的 Bloom 过滤器，不可用时返回 False"""
+        try:
+            with open(self.bloom_path, 'rb') as f:
+                size, hashes, count = BLOOM_HEADER.unpack(f.read(BLOOM_HEADER.size))
+                if (size, hashes, count) != (self.bloom.size, self.bloom.hashes, self.count):
+                    return False
+                bits = f.read()
+        except (OSError, struct.error):
+            return False
+        if len(bits) != len(self.bloom.bits):
+            return False
+        self.bloom.bits = bytearray(bits)
+        return True
+
+    def _rebuild_bloom(self):
+        """从 SQLite 中的全部键重建 Bloom 过滤器"""
+        for (key,) in self._db.execute('SELECT key FROM seen'):
+            self.bloom.add(key)
+
+    def __contains__(self, url):
+        key = canonical_key(url)
+        if key not in self.bloom:
+            return False
+        with self._lock:
+            row = self._db.execute('SELECT 1 FROM seen WHERE key = ?', (key,)).fetchone()
+        return row is not None
+
+    def add(self, url):
+        """
+        记录 URL 已爬取
+
+        Returns:
+            bool: 之前未记录时为 True
+        """
+        key = canonical_key(url)
+        with self._lock:
+            cursor = self._db.execute(
+                'INSERT OR IGNORE INTO seen (key, url, seen_at) VALUES (?, ?, ?)',
+                (key, url, time.time())
+            )
+            self._db.commit()
+            self.bloom.add(key)
+            if cursor.rowcount:
+                self.count += 1
+                return True
+            return False
+
+    def close(self):
+        """保存 Bloom 过滤器并关闭 SQLite 连接"""
+        with self._lock:
+            temp_path = self.bloom_path + '.part'
+            with open(temp_path, 'wb') as f:
+                f.write(BLOOM_HEADER.pack(self.bloom.size, self.bloom.hashes, self.count))
+                f.write(self.bloom.bits)
+            os.replace(temp_path, self.bloom_path)
+            self._db.close()
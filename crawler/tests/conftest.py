@@ -0,0 +1,6 @@
+import os
+import sys
+
+CRAWLER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if CRAWLER_DIR not in sys.path:
+    sys.path.insert(0, CRAWLER_DIR)
@@ -0,0 +1,176 @@
+import contextlib
+import io
+import re
+
+import mongomock
+import pytest
+from bson import ObjectId
+
+from app.middlewares.rate_limiter import HostRateLimiter
+from benchmarks import fixtures
+from benchmarks.server import FixtureServer
+from chunk_store import FLOOR_SEPARATOR, PREVIEW_CHARS
+from crawl import ForumCrawler
+
+# novel 语料每页约 75000 字：一页内联保存，三页超过块大小后分块保存
+CHUNK_CHARS = 100000
+# 完整的 50 页约 375 万字，按该块大小分为 19 块
+FULL_CHUNK_CHARS = 200000
+FULL_CHUNKS = 19
+
+
+@pytest.fixture
+def server():
+    with FixtureServer() as server:
+        yield server
+
+
+def serve_pages(server, count, name='novel'):
+    """替身服务只提供帖子的前 count 页（分页链接同样截断），模拟帖子更新"""
+    tid = str(fixtures.TID_BASE[name])
+    pages = fixtures.thread_pages(name, server.base_url)
+    server.httpd.threads[tid] = {
+        page: re.sub(
+            r'<a href="read\.php\?tid=\d+&page=(\d+)">\d+</a>',
+            lambda match: match.group(0) if int(match.group(1)) <= count else '',
+            html,
+        )
+        for page, html in pages.items() if page <= count
+    }
+
+
+def crawl(client, url, incremental=False, **options):
+    crawler = ForumCrawler(
+        str(ObjectId()), 'mongodb://unused', mongo_client=client,
+        rate_limiter=HostRateLimiter.from_delay(0, min_rate=1000, max_rate=1000), **options
+    )
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = crawler.crawl_forum(url, 'novel', incremental=incremental)
+        assert result['success'], result
+        return crawler
+    finally:
+        crawler.close()
+
+
+def stored_text(client, url, codec):
+    """帖子的完整正文：分块保存时按 seq 读取并拼接各块"""
+    db = client['forum-crawler']
+    post = db['posts'].find_one({'sourceUrl': url})
+    index = post.get('contentChunks')
+    if not index:
+        return codec.unpack(post, 'content')
+    chunks = db['post_chunks'].find({'generation': index['generation']}).sort('seq')
+    return FLOOR_SEPARATOR.join(codec.unpack(chunk, 'text') for chunk in chunks)
+
+
+def inline_text(url):
+    """不分块、不压缩时保存的完整正文，作为分块正文的对照"""
+    client = mongomock.MongoClient()
+    crawl(client, url, novel_chunk_chars=0)
+    return client['forum-crawler']['posts'].find_one({'sourceUrl': url})['content']
+
+
+def chunks(client):
+    return list(client['forum-crawler']['post_chunks'].find().sort('seq'))
+
+
+def test_full_save_splits_into_chunks(server):
+    url = server.thread_url('novel')
+    client = mongomock.MongoClient()
+    crawler = crawl(client, url, novel_chunk_chars=FULL_CHUNK_CHARS)
+
+    post = client['forum-crawler']['posts'].find_one({'sourceUrl': url})
+    index = post['contentChunks']
+    text = inline_text(url)
+    assert index['count'] == FULL_CHUNKS
+    assert [chunk['seq'] for chunk in chunks(client)] == list(range(FULL_CHUNKS))
+    assert {chunk['generation'] for chunk in chunks(client)} == {index['generation']}
+    assert post['content'] == text[:PREVIEW_CHARS]
+    assert stored_text(client, url, crawler.text_codec) == text
+
+
+def test_incremental_crawl_appends_to_chunks(server):
+    url = server.thread_url('novel')
+    client = mongomock.MongoClient()
+
+    serve_pages(server, 10)
+    crawl(client, url, novel_chunk_chars=CHUNK_CHARS)
+    before = client['forum-crawler']['posts'].find_one({'sourceUrl': url})['contentChunks']
+
+    serve_pages(server, 20)
+    crawler = crawl(client, url, incremental=True, novel_chunk_chars=CHUNK_CHARS)
+    after = client['forum-crawler']['posts'].find_one({'sourceUrl': url})['contentChunks']
+    assert after['generation'] == before['generation']
+    assert after['count'] > before['count']
+    assert len(chunks(client)) == after['count']
+    assert stored_text(client, url, crawler.text_codec) == inline_text(url)
+
+
+def test_inline_post_switches_to_chunks(server):
+    url = server.thread_url('novel')
+    client = mongomock.MongoClient()
+
+    serve_pages(server, 1)
+    crawl(client, url, novel_chunk_chars=CHUNK_CHARS)
+    post = client['forum-crawler']['posts'].find_one({'sourceUrl': url})
+    assert 'contentChunks' not in post and chunks(client) == []
+
+    serve_pages(server, 3)
+    crawler = crawl(client, url, incremental=True, novel_chunk_chars=CHUNK_CHARS)
+    post = client['forum-crawler']['posts'].find_one({'sourceUrl': url})
+    text = inline_text(url)
+    assert post['contentChunks']['count'] > 1
+    assert post['content'] == text[:PREVIEW_CHARS]
+    assert stored_text(client, url, crawler.text_codec) == text
+
+
+def test_full_crawl_replaces_chunk_generation(server):
+    url = server.thread_url('novel')
+    client = mongomock.MongoClient()
+    crawl(client, url, novel_chunk_chars=FULL_CHUNK_CHARS)
+    old = client['forum-crawler']['posts'].find_one({'sourceUrl': url})['contentChunks']
+
+    crawler = crawl(client, url, novel_chunk_chars=FULL_CHUNK_CHARS)
+    new = client['forum-crawler']['posts'].find_one({'sourceUrl': url})['contentChunks']
+    assert new['generation'] != old['generation']
+    # 旧版本的分块在新索引保存后删除
+    assert {chunk['generation'] for chunk in chunks(client)} == {new['generation']}
+    assert len(chunks(client)) == FULL_CHUNKS
+    assert stored_text(client, url, crawler.text_codec) == inline_text(url)
+
+
+def test_chunked_post_switches_to_inline(server):
+    url = server.thread_url('novel')
+    client = mongomock.MongoClient()
+    crawl(client, url, novel_chunk_chars=CHUNK_CHARS)
+
+    # 完整爬取的内容不足一块时改为内联保存，并删除全部分块
+    serve_pages(server, 1)
+    crawl(client, url, novel_chunk_chars=CHUNK_CHARS)
+    post = client['forum-crawler']['posts'].find_one({'sourceUrl': url})
+    assert 'contentChunks' not in post
+    assert chunks(client) == []
+    assert post['content'] == inline_text(url)
+
+
+def test_compressed_inline_post_switches_to_chunks(server):
+    pytest.importorskip('zstandard')
+    url = server.thread_url('novel')
+    client = mongomock.MongoClient()
+
+    serve_pages(server, 1)
+    crawl(client, url, novel_chunk_chars=CHUNK_CHARS, compress_content=True)
+    post = client['forum-crawler']['posts'].find_one({'sourceUrl': url})
+    assert 'contentZstd' in post and 'contentChunks' not in post
+
+    serve_pages(server, 3)
+    crawler = crawl(client, url, incremental=True, novel_chunk_chars=CHUNK_CHARS, compress_content=True)
+    post = client['forum-crawler']['posts'].find_one({'sourceUrl': url})
+    assert post['contentChunks']['count'] > 1
+    assert not {'contentZstd', 'contentDictId', 'contentChars'} & set(post)
+    assert 0 < len(post['content']) <= PREVIEW_CHARS
+
+    inline = mongomock.MongoClient()
+    crawl(inline, url, novel_chunk_chars=0)
+    assert stored_text(client, url, crawler.text_codec) == stored_text(inline, url, crawler.text_codec)
@@ -0,0 +1,101 @@
+import glob
+import http.server
+import os
+import threading
+
+import pytest
+
+import image_downloader
+from app.middlewares.retry import RetryPolicy, is_retryable
+from image_fingerprint import FingerprintIndex
+from image_store import ImageStore
+
+BODY = bytes(range(256)) * 64
+
+
+class TruncatingHandler(http.server.BaseHTTPRequestHandler):
+    """Declares the full Content-Length, but the first `truncate` responses stop halfway"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            truncated = server.requests <= server.truncate
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        if truncated:
+            self.wfile.write(BODY[:len(BODY) // 2])
+            self.close_connection = True
+        else:
+            self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), TruncatingHandler)
+    httpd.lock = threading.Lock()
+    httpd.requests = 0
+    httpd.truncate = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    image_store = ImageStore(str(tmp_path / 'store'))
+    monkeypatch.setattr(image_downloader, 'IMAGES_UPLOAD_DIR', str(tmp_path / 'uploads'))
+    monkeypatch.setattr(image_downloader, 'image_store', image_store)
+    monkeypatch.setattr(image_downloader, 'fingerprints', FingerprintIndex(str(tmp_path / 'store')))
+    monkeypatch.setattr(image_downloader, 'NEAR_DUPLICATE_MODE', 'off')
+    image_store.initialize()
+    return image_store
+
+
+def image_url(server, name):
+    return f'http://127.0.0.1:{server.server_address[1]}/{name}.jpg'
+
+
+def test_truncated_body_is_retried(server, store):
+    server.truncate = 1
+    result = image_downloader.download_image(
+        image_url(server, 'retried'), 'task', retry_policy=RetryPolicy(attempts=3, base_delay=0)
+    )
+    assert result['success'], result
+    assert result['bytes'] == len(BODY)
+    assert server.requests == 2
+    path = os.path.join(image_downloader.IMAGES_UPLOAD_DIR, 'task', os.path.basename(result['local_path']))
+    with open(path, 'rb') as f:
+        assert f.read() == BODY
+
+
+def test_truncated_body_fails_after_attempts(server, store):
+    server.truncate = 3
+    result = image_downloader.download_image(
+        image_url(server, 'failed'), 'task', retry_policy=RetryPolicy(attempts=3, base_delay=0)
+    )
+    assert not result['success']
+    assert server.requests == 3
+    # No partial temp file or blob is left behind
+    assert glob.glob(os.path.join(store.blob_dir, '**', '*'), recursive=True) == []
+
+
+def test_length_mismatch_is_retryable(tmp_path):
+    class Response:
+        headers = {'Content-Length': str(len(BODY))}
+
+    temp_path = tmp_path / 'image.part'
+    temp_path.write_bytes(BODY[:-1])
+    with pytest.raises(image_downloader.IncompleteDownloadError) as info:
+        image_downloader._check_complete(Response(), len(BODY) - 1, 'digest', str(temp_path), None)
+    assert is_retryable(error=info.value)
+    assert not temp_path.exists()
@@ -0,0 +1,94 @@
+import http.server
+import os
+import threading
+
+import pytest
+
+from app.middlewares.retry import RetryPolicy
+from app.pipelines import media_download
+from app.pipelines.media_download import MediaDownloadPipeline
+
+BODY = bytes(range(256)) * 64
+
+
+class TruncatingHandler(http.server.BaseHTTPRequestHandler):
+    """Declares the full Content-Length, but the first `truncate` responses stop halfway"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            truncated = server.requests <= server.truncate
+        self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        if server.declare_length:
+            self.send_header('Content-Length', str(len(BODY)))
+        else:
+            self.close_connection = True
+        self.end_headers()
+        if truncated:
+            self.wfile.write(BODY[:len(BODY) // 2])
+            self.close_connection = True
+        else:
+            self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), TruncatingHandler)
+    httpd.lock = threading.Lock()
+    httpd.requests = 0
+    httpd.truncate = 0
+    httpd.declare_length = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_download, 'MEDIA_DOWNLOAD_DIR', str(tmp_path))
+    pipeline = MediaDownloadPipeline()
+    yield pipeline
+    pipeline.close()
+
+
+def media_url(server):
+    return f'http://127.0.0.1:{server.server_address[1]}/clip.mp4'
+
+
+def downloaded_files(pipeline):
+    return sorted(name for name in os.listdir(pipeline.download_dir) if name != 'thumbnails')
+
+
+def test_truncated_body_is_retried(server, pipeline):
+    server.truncate = 1
+    result = pipeline.download_media(media_url(server), 'post', 'task', retry_policy=RetryPolicy(attempts=3, base_delay=0))
+    assert result is not None
+    assert result['size'] == len(BODY)
+    assert server.requests == 2
+    assert downloaded_files(pipeline) == [result['filename']]
+    with open(result['filepath'], 'rb') as f:
+        assert f.read() == BODY
+
+
+def test_truncated_body_leaves_no_partial_file(server, pipeline):
+    server.truncate = 3
+    result = pipeline.download_media(media_url(server), 'post', 'task', retry_policy=RetryPolicy(attempts=3, base_delay=0))
+    assert result is None
+    assert server.requests == 3
+    assert downloaded_files(pipeline) == []
+
+
+def test_size_is_capped_without_content_length(server, pipeline, monkeypatch):
+    monkeypatch.setattr(media_download, 'MAX_MEDIA_SIZE', len(BODY) // 2)
+    server.declare_length = False
+    assert pipeline.download_media(media_url(server), 'post', 'task') is None
+    assert downloaded_files(pipeline) == []
@@ -0,0 +1,34 @@
+import pytest
+
+from page_parser import available_backends, parse_page
+
+PAGE = '''<html>
+<head><title>页面标题</title><style>h4 { color: red; }</style></head>
+<body>
+<h4 class="f16">帖子<script>var title = 1;</script>标题</h4>
+<div class="tpc_content">第一楼<script>document.write("ad");</script><style>.tpc_content { margin: 0; }</style>正文
+<img ess-data="http://img.example/a.jpg" src="http://img.example/lazy.gif"></div>
+<div class="tpc_content">第二楼<img src="http://img.example/b.jpg"></div>
+<a href="read.php?tid=1&page=2">2</a><a href="read.php?tid=1&page=5">5</a>
+</body>
+</html>'''
+
+
+@pytest.mark.parametrize('backend', available_backends())
+def test_script_and_style_excluded(backend):
+    page = parse_page(PAGE, backend)
+    assert page.title == '帖子标题'
+    assert page.floors == [
+        ('第一楼正文', ['http://img.example/a.jpg']),
+        ('第二楼', ['http://img.example/b.jpg']),
+    ]
+    assert page.max_page == 5
+
+
+def test_backends_agree():
+    results = {
+        backend: (page.title, page.floors, page.fallback, page.page_numbers, page.links)
+        for backend in available_backends()
+        for page in [parse_page(PAGE, backend)]
+    }
+    assert len(set(map(repr, results.values()))) == 1, results
@@ -5,6 +5,65 @@ import { ArrowLeftOutlined, DownloadOutlined, CopyOutlined } from '@ant-design/i
 import { postApi } from '../services/api';
 import dayjs from 'dayjs';
 
+// 分块保存的长篇正文：每次只从后端读取一块
+const ChunkedContent = ({ post }) => {
+  const [page, setPage] = useState(1);
+  const [chunk, setChunk] = useState(null);
+  const [loading, setLoading] = useState(false);
+  const total = post.contentChunks.count;
+
+  useEffect(() => {
+    setLoading(true);
+    postApi.getChunks(post._id, { page, limit: 1 })
+      .then((response) => setChunk(response.data.data[0] || null))
+      .catch((error) => console.error('Error fetching content chunk:', error))
+      .finally(() => setLoading(false));
+  }, [post._id, page]);
+
+  return (
+    <Spin spinning={loading}>
+      <div style={{ maxHeight: '500px', overflowY: 'auto', padding: '12px', backgroundColor: '#fafafa', borderRadius: '4px', whiteSpace: 'pre-wrap', wordBreak: 'break-word', lineHeight: 1.6, marginBottom: 16 }}>
+        {chunk ? chunk.text : ''}
+      </div>
+      {total > 1 && (
+        <div style={{ display: 'flex', justifyContent: 'center', gap: 8, marginTop: 16 }}>
+          <Button disabled={page === 1} onClick={() => setPage(page - 1)}>
+            上一页
+          </Button>
+          <span style={{ padding: '4px 12px', lineHeight: '32px' }}>
+            第 {page} / {total} 页{chunk && chunk.firstPage ? ` (原帖第 ${chunk.firstPage}-${chunk.lastPage} 页)` : ''}
+          </span>
+          <Button disabled={page === total} onClick={() => setPage(page + 1)}>
+            下一页
+          </Button>
+        </div>
+      )}
+    </Spin>
+  );
+};
+
+// 压缩保存的正文：列表只返回预览，展开时从后端读取全文
+const FullText = ({ post, children }) => {
+  const [text, setText] = useState(null);
+
+  useEffect(() => {
+    postApi.getText(post._id)
+      .then((response) => setText(response.data))
+      .catch((error) => console.error('Error fetching content:', error));
+  }, [post._id]);
+
+  return text === null ? <Spin /> : children(text);
+};
+
+// 正文全文：分块或压缩保存的帖子从后端读取
+const getFullContent = async (post) => {
+  if (post.contentChunks || post.contentChars) {
+    const response = await postApi.getText(post._id);
+    return response.data;
+  }
+  return post.content;
+};
+
 const PostPreview = () => {
   const { taskId } = useParams();
   const navigate = useNavigate();
@@ -19,15 +78,16 @@ const PostPreview = () => {
     }
   }, [taskId, pagination.current, pagination.pageSize]);
 
-  const handleDownloadText = (post) => {
+  const handleDownloadText = async (post) => {
     try {
+      const content = await getFullContent(post);
       // 构建文本内容
       let text = `标题: ${post.title}\n`;
       text += `作者: ${post.author || '匿名'}\n`;
       text += `发布时间: ${dayjs(post.createdAt).format('YYYY-MM-DD HH:mm:ss')}\n`;
       text += `原始链接: ${post.sourceUrl}\n`;
       text += '\n===============================================\n\n';
-      text += post.content || '（暂无内容）';
+      text += content || '（暂无内容）';
       text += '\n\n===============================================\n';
 
       // 创建 Blob 对象
@@ -54,9 +114,9 @@ const PostPreview = () => {
     }
   };
 
-  const handleCopyContent = (content) => {
+  const handleCopyContent = async (post) => {
     try {
-      navigator.clipboard.writeText(content);
+      await navigator.clipboard.writeText(await getFullContent(post));
       message.success('内容已复制到剪贴板');
     } catch (error) {
       console.error('Copy error:', error);
@@ -97,6 +157,38 @@ const PostPreview = () => {
     });
   };
 
+  // 正文按字符数分页显示
+  const renderContentPages = (postId, content) => {
+    const pag = getContentPagination(postId, content);
+    const currentContent = getCurrentPageContent(postId, content);
+    return (
+      <div>
+        <div style={{ maxHeight: '500px', overflowY: 'auto', padding: '12px', backgroundColor: '#fafafa', borderRadius: '4px', whiteSpace: 'pre-wrap', wordBreak: 'break-word', lineHeight: 1.6, marginBottom: 16 }}>
+          {currentContent}
+        </div>
+        {pag.totalPages > 1 && (
+          <div style={{ display: 'flex', justifyContent: 'center', gap: 8, marginTop: 16 }}>
+            <Button 
+              disabled={pag.currentPage === 1}
+              onClick={() => handleContentPageChange(postId, pag.currentPage - 1)}
+            >
+              上一页
+            </Button>
+            <span style={{ padding: '4px 12px', lineHeight: '32px' }}>
+              第 {pag.currentPage} / {pag.totalPages} 页
+            </span>
+            <Button 
+              disabled={pag.currentPage === pag.totalPages}
+              onClick={() => handleContentPageChange(postId, pag.currentPage + 1)}
+            >
+              下一页
+            </Button>
+          </div>
+        )}
+      </div>
+    );
+  };
+
   const getImageUrl = (media) => {
     // 如果是本地路径（以 /public 开头），需要指向后端服务器
     if (media.url && media.url.startsWith('/public')) {
@@ -195,7 +287,7 @@ const PostPreview = () => {
                       ghost 
                       size="small" 
                       icon={<CopyOutlined />}
-                      onClick={() => handleCopyContent(post.content)}
+                      onClick={() => handleCopyContent(post)}
                     >
                       复制
                     </Button>
@@ -205,37 +297,10 @@ const PostPreview = () => {
                   items={[
                     {
                       key: '1',
-                      label: `点击展开完整内容 (${post.content.length} 字)`,
-                      children: (() => {
-                        const pag = getContentPagination(post._id, post.content);
-                        const currentContent = getCurrentPageContent(post._id, post.content);
-                        return (
-                          <div>
-                            <div style={{ maxHeight: '500px', overflowY: 'auto', padding: '12px', backgroundColor: '#fafafa', borderRadius: '4px', whiteSpace: 'pre-wrap', wordBreak: 'break-word', lineHeight: 1.6, marginBottom: 16 }}>
-                              {currentContent}
-                            </div>
-                            {pag.totalPages > 1 && (
-                              <div style={{ display: 'flex', justifyContent: 'center', gap: 8, marginTop: 16 }}>
-                                <Button 
-                                  disabled={pag.currentPage === 1}
-                                  onClick={() => handleContentPageChange(post._id, pag.currentPage - 1)}
-                                >
-                                  上一页
-                                </Button>
-                                <span style={{ padding: '4px 12px', lineHeight: '32px' }}>
-                                  第 {pag.currentPage} / {pag.totalPages} 页
-                                </span>
-                                <Button 
-                                  disabled={pag.currentPage === pag.totalPages}
-                                  onClick={() => handleContentPageChange(post._id, pag.currentPage + 1)}
-                                >
-                                  下一页
-                                </Button>
-                              </div>
-                            )}
-                          </div>
-                        );
-                      })(),
+                      label: `点击展开完整内容 (${post.contentChunks ? post.contentChunks.chars : post.contentChars || post.content.length} 字)`,
+                      children: post.contentChunks ? <ChunkedContent post={post} /> : post.contentChars ? (
+                        <FullText post={post}>{(text) => renderContentPages(post._id, text)}</FullText>
+                      ) : renderContentPages(post._id, post.content),
                     },
                   ]}
                 />
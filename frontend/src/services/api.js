@@ -62,6 +62,8 @@ export const postApi = {
   getById: (id) => api.get(`/posts/${id}`),
   getByTaskId: (taskId, params) => api.get(`/posts/task/${taskId}`, { params }),
   getStats: (taskId) => api.get(`/posts/task/${taskId}/stats`),
+  getChunks: (id, params) => api.get(`/posts/${id}/chunks`, { params }),
+  getText: (id) => api.get(`/posts/${id}/text`, { responseType: 'text' }),
   create: (data) => api.post('/posts', data),
   update: (id, data) => api.put(`/posts/${id}`, data),
   delete: (id) => api.delete(`/posts/${id}`),